@@ -1,3 +1,6 @@
+import json
+import os
+import time
 import tensorflow as tf
 import numpy as np
 
@@ -82,7 +85,12 @@ def get_preprocessing_model(base_model_path=None):
     full_model = tf.keras.Model(inputs=input_audio, outputs=outputs)
     return full_model
 
-def convert_to_tflite(model, filename="model_with_preprocessing.tflite"):
+def convert_to_tflite(model, filename="model_with_preprocessing.tflite", quantization=None, representative_data=None):
+    """
+    quantization: None (float32), "dynamic", "float16" or "int8".
+    int8 calibrates on representative_data (raw audio clips of INPUT_LENGTH samples);
+    ops that can't run in int8 (STFT, log) stay float, and so do the model's input/output.
+    """
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
     # Key: Enable TF Ops (Flex) might be needed for Signal ops, 
     # BUT standard STFT is supported in TFLite now (mostly).
@@ -91,15 +99,127 @@ def convert_to_tflite(model, filename="model_with_preprocessing.tflite"):
         tf.lite.OpsSet.TFLITE_BUILTINS, # Try standard first
         tf.lite.OpsSet.SELECT_TF_OPS # Fallback to Flex
     ]
+    if quantization is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if representative_data is None:
+            raise ValueError("int8 quantization needs representative_data for calibration")
+        converter.representative_dataset = lambda: ([np.asarray(clip, dtype=np.float32)[np.newaxis]] for clip in representative_data)
     tflite_model = converter.convert()
     
     with open(filename, 'wb') as f:
         f.write(tflite_model)
     print(f"Saved {filename}")
 
+def find_clips(dataset_path):
+    """(path, label) for every wav under a 'normal' (0) or 'abnormal' (1) folder of dataset_path."""
+    clips = []
+    for root, dirs, files in os.walk(dataset_path):
+        dirs.sort()
+        folder = os.path.basename(root).lower()
+        if folder not in ("normal", "abnormal"):
+            continue
+        clips.extend((os.path.join(root, name), int(folder == "abnormal")) for name in sorted(files) if name.lower().endswith(".wav"))
+    return clips
+
+def load_clips(paths):
+    """Raw audio at SAMPLE_RATE, trimmed or zero-padded to INPUT_LENGTH samples: (len(paths), INPUT_LENGTH)."""
+    import librosa
+    clips = np.zeros((len(paths), INPUT_LENGTH), dtype=np.float32)
+    for i, path in enumerate(paths):
+        audio, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True, duration=DURATION_SEC)
+        clips[i, :min(len(audio), INPUT_LENGTH)] = audio[:INPUT_LENGTH]
+    return clips
+
+def sample_dataset(dataset_path, calibration_size=100, eval_size=200, seed=0):
+    """
+    Random, disjoint calibration and evaluation sets of real recordings:
+    (calibration clips, evaluation clips, evaluation labels).
+    """
+    clips = find_clips(dataset_path)
+    if not clips:
+        raise ValueError(f"No wavs under normal/ or abnormal/ folders in {dataset_path}")
+    order = np.random.default_rng(seed).permutation(len(clips))
+    calibration = [clips[i][0] for i in order[:calibration_size]]
+    evaluation = [clips[i] for i in order[calibration_size:calibration_size + eval_size]]
+    print(f"Loading {len(calibration)} calibration and {len(evaluation)} evaluation clips from {dataset_path}...")
+    return load_clips(calibration), load_clips([path for path, _ in evaluation]), np.array([label for _, label in evaluation])
+
+def tflite_scores(filename, clips, latency_runs=20):
+    """Fault-class scores of the .tflite model on clips (one clip per invoke) and its median single-clip latency in ms."""
+    interpreter = tf.lite.Interpreter(model_path=filename, num_threads=1)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]["index"]
+    output_index = interpreter.get_output_details()[0]["index"]
+
+    def run(clip):
+        interpreter.set_tensor(input_index, clip[np.newaxis])
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)[0, 1]
+
+    scores = np.array([run(clip) for clip in clips])
+    latencies = []
+    for _ in range(latency_runs):
+        start = time.perf_counter()
+        run(np.zeros(INPUT_LENGTH, dtype=np.float32))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return scores, float(np.median(latencies))
+
+def compare_variants(model, filenames, eval_clips=None, eval_labels=None, report_path="model_with_preprocessing_report.json"):
+    """
+    Size, single-clip latency and (given evaluation clips) accuracy and agreement
+    with the Keras model for each exported variant, as a JSON report like src.export writes.
+    """
+    report = {"evaluation_samples": 0 if eval_clips is None else int(len(eval_clips)), "variants": {}}
+    keras_scores = None
+    if eval_clips is not None and len(eval_clips):
+        keras_scores = model.predict(eval_clips, verbose=0)[:, 1]
+        report["keras"] = {"accuracy": float(np.mean((keras_scores > 0.5) == (eval_labels != 0)))}
+    for variant, filename in filenames.items():
+        scores, latency = tflite_scores(filename, eval_clips if keras_scores is not None else np.zeros((0, INPUT_LENGTH), np.float32))
+        entry = {"path": filename, "size_kb": os.path.getsize(filename) / 1024, "latency_ms": latency}
+        if keras_scores is not None:
+            entry["accuracy"] = float(np.mean((scores > 0.5) == (eval_labels != 0)))
+            entry["accuracy_delta"] = entry["accuracy"] - report["keras"]["accuracy"]
+            entry["max_score_diff"] = float(np.abs(scores - keras_scores).max())
+        report["variants"][variant] = entry
+
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print("\n" + "="*62)
+    print(f"{'variant':>8} {'size KB':>10} {'latency ms':>11} {'accuracy':>9} {'Δacc':>7} {'max Δscore':>11}")
+    for variant, r in report["variants"].items():
+        if "accuracy" in r:
+            print(f"{variant:>8} {r['size_kb']:>10.0f} {r['latency_ms']:>11.2f} {r['accuracy']:>9.3f} {r['accuracy_delta']:>+7.3f} {r['max_score_diff']:>11.2e}")
+        else:
+            print(f"{variant:>8} {r['size_kb']:>10.0f} {r['latency_ms']:>11.2f} {'-':>9} {'-':>7} {'-':>11}")
+    print("="*62)
+    print(f"Report written to {report_path}")
+    return report
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export model with in-graph preprocessing to TFLite")
+    parser.add_argument("--quantize", nargs='+', choices=["dynamic", "float16", "int8"], default=[], help="Post-training quantized variants exported next to the float32 model")
+    parser.add_argument("--dataset", type=str, default=None, help="Dataset with normal/abnormal wav folders: int8 calibration and the accuracy comparison")
+    parser.add_argument("--calibration-clips", type=int, default=100, help="Training clips used to calibrate int8")
+    parser.add_argument("--eval-clips", type=int, default=200, help="Other clips used for the accuracy comparison")
+    args = parser.parse_args()
+    if "int8" in args.quantize and args.dataset is None:
+        parser.error("int8 needs --dataset: activation ranges must be calibrated on real recordings")
+
+    calibration_clips = eval_clips = eval_labels = None
+    if args.dataset:
+        calibration_clips, eval_clips, eval_labels = sample_dataset(args.dataset, args.calibration_clips, args.eval_clips)
+
     print("Creating model with in-graph preprocessing...")
     model = get_preprocessing_model()
     model.summary()
-    convert_to_tflite(model)
+    filenames = {"float32": "model_with_preprocessing.tflite"}
+    filenames.update({variant: f"model_with_preprocessing_{variant}.tflite" for variant in args.quantize})
+    for variant, filename in filenames.items():
+        convert_to_tflite(model, filename, None if variant == "float32" else variant, calibration_clips)
+    compare_variants(model, filenames, eval_clips, eval_labels)
     print("DONE. Deploy this model to Android and send RAW AUDIO.")
@@ -0,0 +1,9 @@
+# Gunicorn settings for src.server_app (used by the Dockerfile)
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 7860)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+# Threaded workers: uploads, decoding (see DECODE_WORKERS) and batched model calls overlap across requests
+worker_class = "gthread"
+threads = int(os.environ.get("SERVER_THREADS", 8))
+timeout = 120
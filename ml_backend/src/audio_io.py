@@ -0,0 +1,91 @@
+import functools
+import io
+import math
+import os
+import tempfile
+import uuid
+import librosa
+import numpy as np
+import scipy.signal
+import soundfile as sf
+import soxr
+from src import config
+
+RESAMPLE_QUALITIES = ["soxr_hq", "soxr_qq", "polyphase"]
+
+@functools.lru_cache(maxsize=32)
+def polyphase_filter(up, down, half_width=10):
+    """Kaiser-windowed low-pass FIR for resample_poly at up/down (scipy's default design), built once per ratio."""
+    max_rate = max(up, down)
+    return scipy.signal.firwin(2 * half_width * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+
+def resample(audio, orig_sr, target_sr, quality=config.RESAMPLE_QUALITY):
+    """
+    Resamples a mono float32 waveform; a no-op when the rates already match.
+      soxr_hq:   libsoxr high quality, identical to librosa.load / librosa.resample defaults
+      soxr_qq:   libsoxr quick (cubic) interpolation, fastest, lowest quality
+      polyphase: scipy.signal.resample_poly with a cached filter per up/down ratio
+                 (e.g. 441/320 for 16 kHz -> 22.05 kHz, 1/2 for 44.1 kHz -> 22.05 kHz)
+    """
+    if orig_sr == target_sr:
+        return audio
+    if quality in ("soxr_hq", "soxr_qq"):
+        return soxr.resample(audio, orig_sr, target_sr, quality=quality[len("soxr_"):].upper())
+    if quality == "polyphase":
+        g = math.gcd(int(orig_sr), int(target_sr))
+        up, down = int(target_sr) // g, int(orig_sr) // g
+        return scipy.signal.resample_poly(audio, up, down, window=polyphase_filter(up, down)).astype(np.float32)
+    raise ValueError(f"Unknown resample quality '{quality}' (expected one of {RESAMPLE_QUALITIES})")
+
+def read_audio(source, sample_rate=config.SAMPLE_RATE, duration=config.CLIP_SAMPLES / config.SAMPLE_RATE,
+               quality=config.RESAMPLE_QUALITY):
+    """
+    Decodes a path or file-like object with libsndfile to a mono float32 waveform at
+    sample_rate. Only the first `duration` seconds of frames are read, channels are
+    averaged with NumPy and resampling is skipped when the file is already at sample_rate.
+    With quality="soxr_hq" this matches librosa.load(sr=sample_rate, duration=duration).
+    Raises soundfile.LibsndfileError for formats libsndfile can't parse.
+    """
+    with sf.SoundFile(source) as f:
+        native_rate = f.samplerate
+        frames = int(np.round(native_rate * duration)) if duration is not None else -1
+        audio = f.read(frames, dtype="float32", always_2d=True)
+    
+    # Downmix (frames, channels) -> (frames,)
+    audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    return resample(audio, native_rate, sample_rate, quality)
+
+def decode_audio_bytes(data, sample_rate=config.SAMPLE_RATE, duration=config.CLIP_SAMPLES / config.SAMPLE_RATE,
+                       quality=config.RESAMPLE_QUALITY):
+    """
+    Decodes an in-memory audio file to a mono float32 waveform at sample_rate,
+    reading at most `duration` seconds (see read_audio).
+
+    WAV/FLAC/OGG are decoded straight from the buffer by libsndfile. Formats libsndfile
+    can't parse (mp3, m4a, ...) fall back to a temp file read through librosa/audioread.
+    """
+    try:
+        return read_audio(io.BytesIO(data), sample_rate, duration, quality)
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        return _decode_via_temp_file(data, sample_rate, duration)
+
+def probe_duration(data):
+    """Duration in seconds of an in-memory audio file from its header, or None if unknown."""
+    try:
+        return sf.info(io.BytesIO(data)).duration
+    except Exception:
+        return None
+
+def _decode_via_temp_file(data, sample_rate, duration):
+    """Fallback for containers libsndfile can't read from memory."""
+    temp_path = os.path.join(tempfile.gettempdir(), f"temp_{uuid.uuid4()}")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        audio, _ = librosa.load(temp_path, sr=sample_rate, duration=duration)
+        return audio
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError as e:
+            print(f"Warning: Could not remove temp file {temp_path}: {e}")
@@ -0,0 +1,100 @@
+import numpy as np
+import tensorflow as tf
+from src import config
+
+FEATURE_DB_SCALE = 12.0 # Typical per-clip std (dB) of the log-mel spectrogram; maps standardized features back to ~dB for mixing
+NOISE_CANDIDATES = 8 # Background draws per clip when looking for one from another machine
+
+def _standardize(x):
+    mean = tf.reduce_mean(x, axis=[1, 2, 3], keepdims=True)
+    std = tf.math.reduce_std(x, axis=[1, 2, 3], keepdims=True)
+    return (x - mean) / (std + 1e-8)
+
+class Augmenter:
+    """
+    Batched on-the-fly augmentation of (batch, n_mels, frames, 1) training features,
+    run inside the tf.data pipeline so no augmented copies are stored.
+
+    Per clip: mix in a normal clip from another machine as background (random
+    level), circularly shift in time, then apply SpecAugment frequency and time masks.
+    Every random draw is stateless and keyed by a per-batch seed, so a seeded run
+    produces the same augmentations however the parallel map calls are scheduled.
+
+    Features are stored standardized per clip, which makes a plain gain change a
+    no-op; gain is therefore applied to the mixed-in background (AUGMENT_NOISE_SNR_DB).
+    Mixing happens in approximate power: standardized values are scaled by
+    FEATURE_DB_SCALE to dB, summed as powers and re-standardized.
+    """
+    def __init__(self, store, indices, roll_frames=config.AUGMENT_ROLL_FRAMES, noise_prob=config.AUGMENT_NOISE_PROB,
+                 snr_db=config.AUGMENT_NOISE_SNR_DB, freq_masks=config.AUGMENT_FREQ_MASKS,
+                 freq_mask_width=config.AUGMENT_FREQ_MASK_WIDTH, time_masks=config.AUGMENT_TIME_MASKS,
+                 time_mask_width=config.AUGMENT_TIME_MASK_WIDTH):
+        indices = np.asarray(indices, dtype=np.int64)
+        _, group_codes = np.unique(store.groups, return_inverse=True)
+        normal = indices[store.labels[indices] == 0]
+        self.roll_frames = roll_frames
+        self.noise_prob = noise_prob if len(normal) else 0.0
+        self.snr_db = snr_db
+        self.freq_masks, self.freq_mask_width = freq_masks, freq_mask_width
+        self.time_masks, self.time_mask_width = time_masks, time_mask_width
+        self.group_codes = tf.constant(group_codes.astype(np.int64))
+        self.noise_indices = tf.constant(normal if len(normal) else np.zeros(1, dtype=np.int64))
+        self.noise_groups = tf.constant(group_codes[normal].astype(np.int64) if len(normal) else np.full(1, -1, dtype=np.int64))
+
+    def pick_noise(self, batch_indices, seed):
+        """
+        Background store index for each clip (a normal clip from a different machine)
+        and whether to mix it in. Clips with no other-machine candidate among
+        NOISE_CANDIDATES draws are left clean.
+        """
+        n = tf.shape(batch_indices)[0]
+        draw_seed, use_seed = tf.unstack(tf.random.experimental.stateless_split(seed, 2))
+        draws = tf.random.stateless_uniform([n, NOISE_CANDIDATES], draw_seed, minval=0,
+                                            maxval=tf.size(self.noise_indices, out_type=tf.int64), dtype=tf.int64)
+        own_group = tf.gather(self.group_codes, batch_indices)[:, tf.newaxis]
+        valid = tf.not_equal(tf.gather(self.noise_groups, draws), own_group)
+        first = tf.argmax(tf.cast(valid, tf.int32), axis=1)
+        noise_indices = tf.gather(tf.gather(self.noise_indices, draws), first, batch_dims=1)
+        use = tf.reduce_any(valid, axis=1) & (tf.random.stateless_uniform([n], use_seed) < self.noise_prob)
+        return noise_indices, use
+
+    def __call__(self, features, noise, use_noise, seed):
+        mix_seed, roll_seed, freq_seed, time_seed = tf.unstack(tf.random.experimental.stateless_split(seed, 4))
+        if self.noise_prob > 0:
+            features = self.mix(features, noise, use_noise, mix_seed)
+        if self.roll_frames > 0:
+            features = self.roll(features, roll_seed)
+        features = self.mask(features, 1, self.freq_masks, self.freq_mask_width, freq_seed)
+        features = self.mask(features, 2, self.time_masks, self.time_mask_width, time_seed)
+        return features
+
+    def mix(self, features, noise, use_noise, seed):
+        """Adds noise as power at a random clip-to-background level in snr_db, then re-standardizes."""
+        n = tf.shape(features)[0]
+        snr = tf.random.stateless_uniform([n, 1, 1, 1], seed, self.snr_db[0], self.snr_db[1])
+        to_log = np.log(10.0) / 10.0 # dB -> natural log of power
+        clip_log = features * (FEATURE_DB_SCALE * to_log)
+        noise_log = (noise * FEATURE_DB_SCALE - snr) * to_log
+        mixed = _standardize(tf.reduce_logsumexp(tf.stack([clip_log, noise_log]), axis=0))
+        return tf.where(use_noise[:, tf.newaxis, tf.newaxis, tf.newaxis], mixed, features)
+
+    def roll(self, features, seed):
+        """Circular time shift by up to roll_frames in either direction, per clip."""
+        n, frames = tf.shape(features)[0], tf.shape(features)[2]
+        shift = tf.random.stateless_uniform([n], seed, -self.roll_frames, self.roll_frames + 1, dtype=tf.int32)
+        index = tf.math.floormod(tf.range(frames)[tf.newaxis, :] - shift[:, tf.newaxis], frames)
+        return tf.gather(features, index, axis=2, batch_dims=1)
+
+    @staticmethod
+    def mask(features, axis, count, max_width, seed):
+        """SpecAugment: `count` bands of up to max_width bins along axis (1 = mel, 2 = time) set to the clip mean (0)."""
+        if count <= 0 or max_width <= 0:
+            return features
+        n, size = tf.shape(features)[0], tf.shape(features)[axis]
+        width_seed, start_seed = tf.unstack(tf.random.experimental.stateless_split(seed, 2))
+        width = tf.random.stateless_uniform([n, count], width_seed, 0, max_width + 1, dtype=tf.int32)
+        start = tf.cast(tf.random.stateless_uniform([n, count], start_seed) * tf.cast(size - width + 1, tf.float32), tf.int32)
+        position = tf.range(size)[tf.newaxis, tf.newaxis, :]
+        masked = tf.reduce_any((position >= start[..., tf.newaxis]) & (position < (start + width)[..., tf.newaxis]), axis=1)
+        shape = [n, size, 1, 1] if axis == 1 else [n, 1, size, 1]
+        return tf.where(tf.reshape(masked, shape), tf.zeros_like(features), features)
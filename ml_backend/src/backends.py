@@ -0,0 +1,163 @@
+import threading
+import numpy as np
+from src import config
+
+class KerasBackend:
+    """Runs the full Keras .h5 model through TensorFlow."""
+    name = "keras"
+    input_kind = "features" # (batch,) + INPUT_SHAPE log-mel features
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+def _interpreter_class():
+    """Prefers the standalone TFLite runtime; falls back to the one bundled with TensorFlow."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+def batch_buckets(max_batch_size=config.MAX_BATCH_SIZE):
+    """Powers of two up to max_batch_size (plus max_batch_size itself): the batch shapes a TFLite interpreter is built for."""
+    buckets, size = [], 1
+    while size < max_batch_size:
+        buckets.append(size)
+        size *= 2
+    return tuple(buckets + [max(1, max_batch_size)])
+
+class TFLiteBackend:
+    """
+    Runs the exported .tflite model through a TFLite interpreter.
+
+    Interpreters are not thread-safe, so each thread lazily builds its own, one per
+    batch-size bucket (powers of two up to max_batch_size). A batch is zero-padded to
+    the next bucket and the padding rows are sliced off the output, so the varying
+    batch sizes coming out of the micro-batcher never resize or reallocate tensors.
+    Batches larger than max_batch_size run in max_batch_size chunks.
+    """
+    name = "tflite"
+    input_kind = "features"
+
+    def __init__(self, model_path, num_threads=config.TFLITE_NUM_THREADS, max_batch_size=config.MAX_BATCH_SIZE):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.batch_buckets = batch_buckets(max_batch_size)
+        self._interpreter_cls = _interpreter_class()
+        self._local = threading.local()
+        self._interpreter(1) # Fail fast on a missing/corrupt model
+
+    def _interpreter(self, bucket):
+        """This thread's interpreter for a bucket: (interpreter, input details, output details)."""
+        interpreters = getattr(self._local, "interpreters", None)
+        if interpreters is None:
+            interpreters = self._local.interpreters = {}
+        entry = interpreters.get(bucket)
+        if entry is None:
+            interpreter = self._interpreter_cls(model_path=self.model_path, num_threads=self.num_threads)
+            input_details = interpreter.get_input_details()[0]
+            if input_details["shape"][0] != bucket:
+                interpreter.resize_tensor_input(input_details["index"], [bucket] + list(input_details["shape"][1:]))
+            interpreter.allocate_tensors()
+            entry = interpreters[bucket] = (interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0])
+        return entry
+
+    @staticmethod
+    def _quantization(details):
+        """(scale, zero_point, dtype) for integer tensors, None for float ones."""
+        scale, zero_point = details["quantization"]
+        if np.issubdtype(details["dtype"], np.integer) and scale:
+            return scale, zero_point, details["dtype"]
+        return None
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        largest = self.batch_buckets[-1]
+        outputs = [self._predict_bucket(batch[i:i + largest]) for i in range(0, len(batch), largest)]
+        if not outputs:
+            _, _, output_details = self._interpreter(1)
+            return np.zeros((0,) + tuple(output_details["shape"][1:]), dtype=np.float32)
+        return np.concatenate(outputs)
+
+    def _predict_bucket(self, batch):
+        n = len(batch)
+        bucket = next(size for size in self.batch_buckets if size >= n)
+        if bucket > n:
+            batch = np.concatenate([batch, np.zeros((bucket - n,) + batch.shape[1:], dtype=np.float32)])
+        interpreter, input_details, output_details = self._interpreter(bucket)
+        # Full-integer (int8) models take and return quantized tensors
+        input_quant = self._quantization(input_details)
+        if input_quant is not None:
+            scale, zero_point, dtype = input_quant
+            info = np.iinfo(dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+        interpreter.set_tensor(input_details["index"], batch)
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details["index"])[:n].copy()
+        output_quant = self._quantization(output_details)
+        if output_quant is not None:
+            scale, zero_point, _ = output_quant
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+class FusedBackend:
+    """
+    Runs the fused export from src.fused_model, which takes (batch, CLIP_SAMPLES) raw
+    waveforms and does the log-mel front end in the same graph as the CNN.
+    model_path is the SavedModel directory (serving_default signature) or its .tflite file.
+    """
+    name = "fused"
+    input_kind = "waveform"
+
+    def __init__(self, model_path, num_threads=config.TFLITE_NUM_THREADS):
+        self.model_path = model_path
+        self.batch_buckets = ()
+        if model_path.endswith(".tflite"):
+            self._tflite = TFLiteBackend(model_path, num_threads)
+            self.batch_buckets = self._tflite.batch_buckets
+        else:
+            import tensorflow as tf
+            self._tflite = None
+            self.model = tf.saved_model.load(model_path) # Keeps the variables alive for the signature
+            self._signature = self.model.signatures["serving_default"]
+            self._input_name = next(iter(self._signature.structured_input_signature[1]))
+            self._tf = tf
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if self._tflite is not None:
+            return self._tflite.predict(batch)
+        outputs = self._signature(**{self._input_name: self._tf.constant(batch)})
+        return next(iter(outputs.values())).numpy()
+
+BACKENDS = {
+    KerasBackend.name: KerasBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    FusedBackend.name: FusedBackend,
+}
+
+def default_model_path(kind):
+    if kind == TFLiteBackend.name:
+        return config.TFLITE_MODEL_PATH
+    if kind == FusedBackend.name:
+        return config.FUSED_MODEL_PATH
+    return config.MODEL_SAVE_PATH
+
+def input_shape(kind):
+    """Per-example input shape of the named backend: INPUT_SHAPE features or CLIP_SAMPLES raw audio."""
+    return (config.CLIP_SAMPLES,) if BACKENDS[kind].input_kind == "waveform" else config.INPUT_SHAPE
+
+def load_backend(kind=config.INFERENCE_BACKEND, model_path=None, **kwargs):
+    """Builds the named inference backend ('keras', 'tflite' or 'fused')."""
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{kind}' (expected one of {sorted(BACKENDS)})")
+    return BACKENDS[kind](model_path or default_model_path(kind), **kwargs)
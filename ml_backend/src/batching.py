@@ -0,0 +1,162 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from src import config
+from src.metrics import REGISTRY
+
+BATCH_SIZE = REGISTRY.histogram("predict_batch_size", "Requests per model call", buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+QUEUE_WAIT = REGISTRY.histogram("predict_queue_wait_seconds", "Time requests wait in the micro-batcher queue")
+
+class _Request:
+    __slots__ = ("features", "future", "enqueued")
+
+    def __init__(self, features):
+        self.features = features
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class _Call:
+    """A function queued to run on the worker thread (see MicroBatcher.call)."""
+    __slots__ = ("fn", "future")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.future = Future()
+
+    def run(self):
+        try:
+            self.future.set_result(self.fn())
+        except Exception as e:
+            self.future.set_exception(e)
+
+class MicroBatcher:
+    """
+    Collects single-clip requests into batches for one model call.
+
+    submit() enqueues a (1, ...) feature tensor and returns a Future. A worker
+    thread takes the oldest request, keeps collecting until max_batch_size
+    requests are queued or max_wait_ms has passed since that request arrived,
+    runs predict_fn once on the concatenated batch and resolves every future
+    with its own row of the output.
+    """
+    def __init__(self, predict_fn, max_batch_size=config.MAX_BATCH_SIZE, max_wait_ms=config.MAX_BATCH_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = collections.Counter()
+        self._waits_ms = collections.deque(maxlen=1000)
+        self._requests = 0
+        self._errors = 0
+        self._thread = threading.Thread(target=self._worker, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        request = _Request(features)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, features, timeout=None):
+        """Blocking helper: submit and wait for this request's output row."""
+        return self.submit(features).result(timeout)
+
+    def call(self, fn):
+        """
+        Runs fn() on the worker thread, between batches, and returns a Future for its
+        result. Used to warm up per-thread state (TFLite interpreters) on the thread
+        that will serve the predictions.
+        """
+        call = _Call(fn)
+        self._queue.put(call)
+        return call.future
+
+    def _worker(self):
+        while True:
+            first = self._queue.get()
+            if isinstance(first, _Call):
+                first.run()
+                continue
+            batch, calls = [first], []
+            deadline = first.enqueued + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        # Past the deadline: still take whatever is already waiting
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                (calls if isinstance(item, _Call) else batch).append(item)
+            self._run(batch)
+            for call in calls:
+                call.run()
+
+    def _run(self, batch):
+        start = time.perf_counter()
+        BATCH_SIZE.observe(len(batch))
+        for request in batch:
+            # Exposed on the future so callers can split queueing from model time
+            request.future.queue_seconds = start - request.enqueued
+            request.future.batch_size = len(batch)
+            QUEUE_WAIT.observe(request.future.queue_seconds)
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            self._requests += len(batch)
+            self._waits_ms.extend(request.future.queue_seconds * 1000 for request in batch)
+        try:
+            outputs = self.predict_fn(np.concatenate([request.features for request in batch], axis=0))
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        for request, output in zip(batch, outputs):
+            request.future.set_result(output)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """Batch size distribution and queue wait percentiles (over the last 1000 requests)."""
+        with self._lock:
+            waits = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+            batches = sum(self._batch_sizes.values())
+            return {
+                "requests": self._requests,
+                "batches": batches,
+                "errors": self._errors,
+                "mean_batch_size": self._requests / batches if batches else 0.0,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "queue_depth": self.queue_depth(),
+                "queue_wait_ms": {
+                    "p50": float(np.percentile(waits, 50)),
+                    "p95": float(np.percentile(waits, 95)),
+                    "p99": float(np.percentile(waits, 99)),
+                    "max": float(waits.max()),
+                },
+            }
+
+class InflightLimiter:
+    """Non-blocking cap on concurrent requests; callers shed load when try_acquire() fails."""
+    def __init__(self, limit):
+        self.limit = limit
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.count >= self.limit:
+                return False
+            self.count += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.count -= 1
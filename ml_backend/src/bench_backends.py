@@ -0,0 +1,72 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+def _child(kind, model_path, threads, requests):
+    """Runs inside a fresh interpreter so startup time and RSS are measured cleanly."""
+    start = time.perf_counter()
+    import numpy as np
+    from src import backends, config
+    kwargs = {"num_threads": threads} if kind == "tflite" else {}
+    backend = backends.load_backend(kind, model_path, **kwargs)
+    clip = np.random.default_rng(0).standard_normal((1,) + config.INPUT_SHAPE).astype(np.float32)
+    backend.predict(clip) # First call (graph tracing / tensor allocation) counts as startup
+    startup = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(requests):
+        t = time.perf_counter()
+        backend.predict(clip)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    # ru_maxrss is in KB on Linux
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        "backend": kind,
+        "startup_s": startup,
+        "peak_rss_mb": rss_mb,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Keras and TFLite inference backends")
+    parser.add_argument("--keras-model", type=str, default=None, help="Path to .h5 model")
+    parser.add_argument("--tflite-model", type=str, default=None, help="Path to .tflite model")
+    parser.add_argument("--threads", type=int, default=1, help="TFLite interpreter threads")
+    parser.add_argument("--requests", type=int, default=200, help="Single-clip predictions per backend")
+    parser.add_argument("--child", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        model_path = args.tflite_model if args.child == "tflite" else args.keras_model
+        _child(args.child, model_path, args.threads, args.requests)
+        return
+
+    from src import config
+    args.keras_model = args.keras_model or config.MODEL_SAVE_PATH
+    args.tflite_model = args.tflite_model or config.TFLITE_MODEL_PATH
+
+    results = []
+    for kind in ["keras", "tflite"]:
+        print(f"Benchmarking {kind}...")
+        cmd = [sys.executable, "-m", "src.bench_backends", "--child", kind,
+               "--keras-model", args.keras_model, "--tflite-model", args.tflite_model,
+               "--threads", str(args.threads), "--requests", str(args.requests)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"❌ {kind} failed:\n{proc.stderr[-2000:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print("\n" + "="*60)
+    print(f"{'backend':>8} {'startup s':>10} {'peak RSS MB':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['backend']:>8} {r['startup_s']:>10.2f} {r['peak_rss_mb']:>12.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    print("="*60)
+
+if __name__ == "__main__":
+    main()
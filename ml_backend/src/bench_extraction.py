@@ -0,0 +1,52 @@
+import argparse
+import os
+import tempfile
+from src import preprocess
+from src.bench_utils import Timer, make_synthetic_dataset
+
+def bench(dataset_path, worker_counts):
+    """Runs preprocess_dataset once per worker count and returns [(workers, files, seconds)]."""
+    entries = preprocess.find_audio_files(dataset_path)
+    n_files = len(entries)
+    if n_files == 0:
+        print(f"❌ No audio files found under {dataset_path}")
+        return []
+    # Decode and featurize one file first (audio backend imports, MelEngine filterbank) so the first row isn't penalised
+    next(preprocess.iter_features([entries[0][0]], num_workers=1))
+    results = []
+    for workers in worker_counts:
+        with Timer() as t:
+            X, y, groups = preprocess.preprocess_dataset(dataset_path, num_workers=workers)
+        results.append((workers, n_files, t.elapsed))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel feature extraction (files/sec)")
+    parser.add_argument("--dataset", type=str, default=None, help="Dataset to scan. Defaults to a synthetic tree.")
+    parser.add_argument("--files", type=int, default=128, help="Number of synthetic files to generate")
+    parser.add_argument("--workers", type=int, nargs='+', default=None, help="Worker counts to compare (default: 1 4 N)")
+    args = parser.parse_args()
+
+    worker_counts = args.workers or sorted({1, 4, os.cpu_count() or 1})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_path = args.dataset
+        if dataset_path is None:
+            dataset_path = tmp
+            print(f"Generating {args.files} synthetic clips in {tmp}...")
+            make_synthetic_dataset(tmp, n_files=args.files)
+
+        results = bench(dataset_path, worker_counts)
+    if not results:
+        return
+
+    baseline = results[0][1] / results[0][2]
+    print("\n" + "="*50)
+    print(f"{'workers':>8} {'files':>8} {'seconds':>10} {'files/sec':>10} {'speedup':>8}")
+    for workers, n_files, seconds in results:
+        rate = n_files / seconds
+        print(f"{workers:>8} {n_files:>8} {seconds:>10.2f} {rate:>10.1f} {rate / baseline:>7.2f}x")
+    print("="*50)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import sys
+import numpy as np
+from src import config, preprocess
+from src.bench_utils import Timer, synthetic_audio
+from src.mel_engine import MelEngine, PARITY_TOLERANCE
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MelEngine against per-clip librosa feature extraction")
+    parser.add_argument("--clips", type=int, default=64, help="Number of synthetic clips")
+    parser.add_argument("--batch-sizes", type=int, nargs='+', default=[1, 8, 32, 64], help="MelEngine chunk sizes to compare")
+    args = parser.parse_args()
+
+    target_length = config.CLIP_SAMPLES
+    audio = np.stack([synthetic_audio(seed=i, fault=i % 4 == 0)[:target_length] for i in range(args.clips)])
+
+    # Warm up both paths (librosa JIT, filterbank construction)
+    preprocess.extract_features_librosa(audio[0])
+    MelEngine()(audio[:1])
+
+    with Timer() as t:
+        reference = np.stack([preprocess.extract_features_librosa(clip) for clip in audio])
+    librosa_rate = args.clips / t.elapsed
+
+    print("\n" + "="*50)
+    print(f"{'path':>16} {'clips/sec':>10} {'speedup':>8}")
+    print(f"{'librosa':>16} {librosa_rate:>10.1f} {1.0:>7.2f}x")
+    max_error = 0.0
+    for batch_size in args.batch_sizes:
+        engine = MelEngine(chunk_size=batch_size)
+        with Timer() as t:
+            features = engine(audio)
+        rate = args.clips / t.elapsed
+        max_error = max(max_error, float(np.abs(features - reference).max()))
+        print(f"{'engine b=' + str(batch_size):>16} {rate:>10.1f} {rate / librosa_rate:>7.2f}x")
+    print("="*50)
+    print(f"Max abs difference vs librosa: {max_error:.2e} (tolerance {PARITY_TOLERANCE:.0e})")
+
+    if max_error > PARITY_TOLERANCE:
+        print("❌ MelEngine output diverges from librosa!")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
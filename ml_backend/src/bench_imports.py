@@ -0,0 +1,57 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# Modules that only need features, not a model; none of them may import TensorFlow
+FEATURE_MODULES = ["src.preprocess", "src.mel_engine", "src.audio_io", "src.feature_cache", "src.streaming"]
+
+def _child(module):
+    """Runs inside a fresh interpreter so the import is measured cold."""
+    import importlib
+    import time
+    start = time.perf_counter()
+    importlib.import_module(module)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "module": module,
+        "import_s": elapsed,
+        "tensorflow": "tensorflow" in sys.modules,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of the feature modules and check they don't pull in TensorFlow")
+    parser.add_argument("--modules", type=str, nargs='+', default=FEATURE_MODULES + ["tensorflow"], help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (best time is reported)")
+    parser.add_argument("--child", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child)
+        return
+
+    results = []
+    for module in args.modules:
+        runs = []
+        for _ in range(args.repeat):
+            proc = subprocess.run([sys.executable, "-m", "src.bench_imports", "--child", module], capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"❌ Importing {module} failed:\n{proc.stderr}")
+                sys.exit(1)
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        results.append(min(runs, key=lambda r: r["import_s"]))
+
+    print("\n" + "="*50)
+    print(f"{'module':>20} {'import s':>9} {'tensorflow':>11}")
+    for r in results:
+        print(f"{r['module']:>20} {r['import_s']:>9.2f} {'yes' if r['tensorflow'] else 'no':>11}")
+    print("="*50)
+
+    leaks = [r["module"] for r in results if r["tensorflow"] and r["module"] in FEATURE_MODULES]
+    if leaks:
+        print(f"🔴 TensorFlow imported by: {', '.join(leaks)}")
+        sys.exit(1)
+    print("🟢 Feature modules import without TensorFlow")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import os
+import tempfile
+import librosa
+import numpy as np
+from src import audio_io, config, preprocess
+from src.bench_utils import Timer, write_wav
+
+# (sample rate, channels) of the synthetic source files; 16 kHz multichannel is MIMII-style
+CASES = [(16000, 1), (16000, 8), (44100, 2), (48000, 1), (22050, 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare decode + resample speed and accuracy against librosa.load")
+    parser.add_argument("--files", type=int, default=8, help="Synthetic files per case")
+    parser.add_argument("--duration", type=float, default=10, help="Length of each synthetic file in seconds (only CLIP_SAMPLES are decoded)")
+    parser.add_argument("--qualities", type=str, nargs='+', default=audio_io.RESAMPLE_QUALITIES, choices=audio_io.RESAMPLE_QUALITIES)
+    args = parser.parse_args()
+
+    duration = config.CLIP_SAMPLES / config.SAMPLE_RATE
+    print("\n" + "="*86)
+    print(f"{'source':>12} {'path':>10} {'ms/file':>9} {'speedup':>8} {'max wave err':>13} {'max feat err':>13} {'mean feat err':>14}")
+    print("="*86)
+    with tempfile.TemporaryDirectory() as tmp:
+        for sample_rate, channels in CASES:
+            paths = [write_wav(os.path.join(tmp, f"{sample_rate}_{channels}_{i}.wav"), duration=args.duration,
+                               sample_rate=sample_rate, channels=channels, fault=i % 2 == 1, seed=i)
+                     for i in range(args.files)]
+            source = f"{sample_rate // 1000}k/{channels}ch"
+
+            # Reference: the previous read_audio (librosa.load with its default soxr_hq resampler)
+            librosa.load(paths[0], sr=config.SAMPLE_RATE, duration=duration)
+            with Timer() as t:
+                reference = [librosa.load(path, sr=config.SAMPLE_RATE, duration=duration)[0] for path in paths]
+            librosa_ms = t.elapsed * 1000 / len(paths)
+            reference_features = preprocess.extract_features_batch(np.stack([preprocess.fix_length(a) for a in reference]))
+            print(f"{source:>12} {'librosa':>10} {librosa_ms:>9.2f} {1.0:>7.2f}x {'-':>13} {'-':>13} {'-':>14}")
+
+            for quality in args.qualities:
+                audio_io.read_audio(paths[0], quality=quality, duration=duration) # Warm up (filter design, imports)
+                with Timer() as t:
+                    decoded = [audio_io.read_audio(path, quality=quality, duration=duration) for path in paths]
+                ms = t.elapsed * 1000 / len(paths)
+                wave_error = max(float(np.abs(preprocess.fix_length(a) - preprocess.fix_length(r)).max())
+                                 for a, r in zip(decoded, reference))
+                features = preprocess.extract_features_batch(np.stack([preprocess.fix_length(a) for a in decoded]))
+                feature_error = np.abs(features - reference_features)
+                print(f"{source:>12} {quality:>10} {ms:>9.2f} {librosa_ms / ms:>7.2f}x {wave_error:>13.2e} "
+                      f"{feature_error.max():>13.2e} {feature_error.mean():>14.2e}")
+    print("="*86)
+    print("Feature errors are in standardized units (same scale as MelEngine's PARITY_TOLERANCE).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import platform
+import sys
+import time
+from importlib import metadata
+import numpy as np
+import soundfile as sf
+from src import config
+
+def synthetic_audio(duration=config.DURATION, sample_rate=config.SAMPLE_RATE, channels=1, fault=False, seed=0):
+    """Generates a machine-like hum (harmonics + noise). Faulty clips get periodic clicks."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    base = rng.uniform(50, 200)
+    audio = sum(np.sin(2 * np.pi * base * k * t + rng.uniform(0, np.pi)) / k for k in range(1, 5))
+    audio = audio + 0.3 * rng.standard_normal(len(t))
+    if fault:
+        clicks = (np.sin(2 * np.pi * rng.uniform(2, 8) * t) > 0.98).astype(np.float64)
+        audio = audio + 3.0 * clicks * rng.standard_normal(len(t))
+    audio = 0.2 * audio / np.max(np.abs(audio))
+    if channels > 1:
+        audio = np.stack([audio * rng.uniform(0.8, 1.0) for _ in range(channels)], axis=1)
+    return audio.astype(np.float32)
+
+def write_wav(path, duration=config.DURATION, sample_rate=config.SAMPLE_RATE, channels=1, fault=False, seed=0):
+    """Writes one synthetic 16-bit PCM wav file and returns its path."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    audio = synthetic_audio(duration, sample_rate, channels, fault, seed)
+    sf.write(path, audio, sample_rate, subtype="PCM_16")
+    return path
+
+def make_synthetic_dataset(root, n_files=64, n_machines=4, abnormal_ratio=0.25,
+                           duration=config.DURATION, sample_rate=config.SAMPLE_RATE, channels=1):
+    """
+    Creates a MIMII-style tree under root:
+    root/valve/id_XX/{normal,abnormal}/NNNNNNNN.wav
+    Returns the number of files written.
+    """
+    for i in range(n_files):
+        fault = i < int(n_files * abnormal_ratio)
+        machine = f"id_{i % n_machines:02d}"
+        folder = "abnormal" if fault else "normal"
+        path = os.path.join(root, "valve", machine, folder, f"{i:08d}.wav")
+        write_wav(path, duration, sample_rate, channels, fault, seed=i)
+    return n_files
+
+class Timer:
+    """Context manager recording wall-clock seconds in .elapsed."""
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+def machine_info():
+    """Host and library versions, stored with benchmark results so runs can be compared."""
+    versions = {}
+    for package in ["numpy", "scipy", "librosa", "soundfile", "tensorflow", "keras"]:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "packages": versions,
+    }
@@ -0,0 +1,180 @@
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from src import config, preprocess
+from src.bench_utils import Timer, machine_info, make_synthetic_dataset, write_wav
+
+# (duration s, sample rate, channels) of the synthetic clips load_audio is timed on
+AUDIO_CASES = [
+    (2, 16000, 1),
+    (5, 22050, 1),
+    (5, 44100, 2),
+    (30, 48000, 2),
+]
+BATCH_SIZES = [1, 8, 32]
+DEFAULT_THRESHOLD = 0.25 # Fractional slowdown vs the baseline that counts as a regression
+
+def time_stage(fn, repeat, warmup=1):
+    """Calls fn warmup + repeat times; returns median/p90/min wall time of the timed calls in ms."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": float(np.median(times)),
+        "p90_ms": float(np.percentile(times, 90)),
+        "min_ms": float(np.min(times)),
+        "runs": repeat,
+    }
+
+def _report(results, name, stats, **extra):
+    results[name] = dict(stats, **extra)
+    print(f"{name:>36} {stats['median_ms']:>10.2f} {stats['p90_ms']:>10.2f}")
+
+def bench_audio(results, tmp, repeat):
+    for duration, sample_rate, channels in AUDIO_CASES:
+        path = write_wav(os.path.join(tmp, f"clip_{duration}s_{sample_rate}_{channels}ch.wav"),
+                         duration=duration, sample_rate=sample_rate, channels=channels)
+        _report(results, f"load_audio/{duration}s_{sample_rate}Hz_{channels}ch",
+                time_stage(lambda: preprocess.load_audio(path), repeat))
+
+    audio = preprocess.load_audio(path)
+    _report(results, "extract_features", time_stage(lambda: preprocess.extract_features(audio), repeat))
+    batch = np.stack([audio] * 32)
+    _report(results, "extract_features_batch/32", time_stage(lambda: preprocess.extract_features_batch(batch), repeat))
+
+def bench_models(results, tmp, repeat, keras_path, tflite_path):
+    from src import backends
+    features = np.random.default_rng(0).standard_normal((max(BATCH_SIZES),) + config.INPUT_SHAPE).astype(np.float32)
+
+    keras_backend = backends.KerasBackend(keras_path)
+    for batch_size in BATCH_SIZES:
+        _report(results, f"keras_predict/b{batch_size}",
+                time_stage(lambda: keras_backend.predict(features[:batch_size]), repeat), batch_size=batch_size)
+
+    tflite_backend = backends.TFLiteBackend(tflite_path)
+    for batch_size in BATCH_SIZES:
+        _report(results, f"tflite_predict/b{batch_size}",
+                time_stage(lambda: tflite_backend.predict(features[:batch_size]), repeat), batch_size=batch_size)
+
+def bench_server(results, tmp, repeat, keras_path):
+    """End-to-end /predict (upload parsing, decode, features, batcher, predict) via the Flask test client."""
+    from src import server_app
+    # Serve the benchmark model, whatever server_app picked up from the working directory
+    while not server_app.registry.load(keras_path, block=True):
+        time.sleep(0.1)
+    client = server_app.app.test_client()
+    data = open(write_wav(os.path.join(tmp, "upload.wav")), "rb").read()
+
+    def post():
+        response = client.post("/predict", data={"file": (io.BytesIO(data), "upload.wav")})
+        if response.status_code != 200:
+            raise RuntimeError(f"/predict returned {response.status_code}: {response.get_data(as_text=True)}")
+
+    _report(results, "server_predict", time_stage(post, repeat))
+
+def bench_dataset(results, tmp, n_files, worker_counts):
+    dataset_path = os.path.join(tmp, "dataset")
+    make_synthetic_dataset(dataset_path, n_files=n_files)
+    for workers in worker_counts:
+        with Timer() as t:
+            preprocess.preprocess_dataset(dataset_path, num_workers=workers)
+        stats = {"median_ms": t.elapsed * 1000, "p90_ms": t.elapsed * 1000, "min_ms": t.elapsed * 1000, "runs": 1}
+        _report(results, f"preprocess_dataset/{n_files}files_w{workers}", stats, files_per_sec=n_files / t.elapsed)
+
+def build_models(tmp):
+    """Fresh, seeded (untrained) model plus its TFLite conversion: same compute cost as the real one, no files needed."""
+    import tensorflow as tf
+    from src import export, model as model_module
+    tf.keras.utils.set_random_seed(0)
+    model = model_module.create_model()
+    keras_path = os.path.join(tmp, "bench_model.h5")
+    model.save(keras_path)
+    tflite_path = os.path.join(tmp, "bench_model.tflite")
+    with open(tflite_path, "wb") as f:
+        f.write(export.convert(model))
+    return keras_path, tflite_path
+
+def compare(current, baseline, threshold):
+    """Prints current vs baseline medians; returns the names of stages slower by more than threshold."""
+    regressions = []
+    print("\n" + "="*78)
+    print(f"{'stage':>36} {'baseline ms':>12} {'current ms':>11} {'change':>8}")
+    print("="*78)
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        change = result["median_ms"] / base["median_ms"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = " 🔴"
+        print(f"{name:>36} {base['median_ms']:>12.2f} {result['median_ms']:>11.2f} {change:>+7.0%}{flag}")
+    print("="*78)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the audio -> prediction pipeline on synthetic data")
+    parser.add_argument("--output", type=str, default="benchmark.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", type=str, default=None, help="Earlier results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed median slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per stage")
+    parser.add_argument("--files", type=int, default=64, help="Synthetic files for the preprocess_dataset stage")
+    parser.add_argument("--workers", type=int, nargs='+', default=None, help="Worker counts for preprocess_dataset (default: 1 N)")
+    parser.add_argument("--keras-model", type=str, default=None, help="Benchmark this .h5 instead of a fresh model")
+    parser.add_argument("--tflite-model", type=str, default=None, help="Benchmark this .tflite instead of a fresh conversion")
+    parser.add_argument("--skip", type=str, nargs='+', default=[], choices=["audio", "models", "server", "dataset"], help="Stage groups to leave out")
+    args = parser.parse_args()
+
+    worker_counts = args.workers or sorted({1, os.cpu_count() or 1})
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        keras_path, tflite_path = args.keras_model, args.tflite_model
+        if {"models", "server"} - set(args.skip) and not (keras_path and tflite_path):
+            built_keras, built_tflite = build_models(tmp)
+            keras_path, tflite_path = keras_path or built_keras, tflite_path or built_tflite
+
+        print("\n" + "="*60)
+        print(f"{'stage':>36} {'median ms':>10} {'p90 ms':>10}")
+        print("="*60)
+        if "audio" not in args.skip:
+            bench_audio(results, tmp, args.repeat)
+        if "models" not in args.skip:
+            bench_models(results, tmp, args.repeat, keras_path, tflite_path)
+        if "server" not in args.skip:
+            bench_server(results, tmp, args.repeat, keras_path)
+        if "dataset" not in args.skip:
+            bench_dataset(results, tmp, args.files, worker_counts)
+        print("="*60)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_info(),
+        "settings": {"repeat": args.repeat, "files": args.files, "workers": worker_counts,
+                     "keras_model": args.keras_model, "tflite_model": args.tflite_model},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} stage(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"🟢 No stage regressed by more than {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ DURATION = 5  # seconds
 N_MELS = 128
 HOP_LENGTH = 512
 N_FFT = 2048
+RESAMPLE_QUALITY = "soxr_hq" # "soxr_hq" (same as librosa.load), "soxr_qq" (fastest) or "polyphase" (see audio_io.resample)
 
 # Dataset configurations
 DATASET_PATHS = [
@@ -15,10 +16,65 @@ DATASET_PATHS = [
     r"d:\finalminorproject\dataset3"
 ]
 INPUT_SHAPE = (128, 216, 1) # (N_MELS, TimeSteps, Channels) - Approximate for 5s @ 22050Hz with hop 512
+# Samples per clip: SAMPLE_RATE * DURATION, clamped so the centred STFT (1 + samples // HOP_LENGTH frames)
+# yields exactly INPUT_SHAPE[1] frames. 110250 for the defaults, which already gives 216.
+CLIP_SAMPLES = min(max(int(SAMPLE_RATE * DURATION), (INPUT_SHAPE[1] - 1) * HOP_LENGTH), INPUT_SHAPE[1] * HOP_LENGTH - 1)
+WINDOW_HOP_SECONDS = 2.5 # Step between overlapping windows when scoring long recordings
+
+# Feature extraction configurations
+NUM_WORKERS = os.cpu_count() or 1 # Processes used by preprocess_dataset (1 = serial)
+FEATURE_BATCH_SIZE = 16 # Clips featurized per MelEngine call during extraction
+FEATURE_VERSION = 1 # Bump whenever extract_features output changes, to invalidate cached features
+FEATURE_CACHE_DIR = "feature_cache"
+FEATURE_CACHE_MAX_BYTES = 20 * 1024**3 # 20 GB, least-recently-used entries are evicted past this
+FEATURE_STORE_DIR = "feature_store" # Memory-mapped training features (see feature_store.py)
+FEATURE_STORE_SHARD_SIZE = 1024 # Samples per shard (~110 MB at float32)
+MANIFEST_PATH = "dataset_manifest.sqlite" # Incremental index of dataset files, labels and machine IDs (see manifest.py)
 
 # Training configurations
 BATCH_SIZE = 32
 EPOCHS = 50
+SHUFFLE_BUFFER = 100000 # Indices held by the tf.data shuffle buffer (--streaming)
+TRAIN_SEED = None # Seeds weight init, shuffling, class sampling and augmentation for reproducible runs
+# On-the-fly augmentation (train --augment), applied per batch in the tf.data pipeline; nothing extra is stored
+AUGMENT_ROLL_FRAMES = 54 # Max circular time shift in frames (~1.25 s)
+AUGMENT_NOISE_PROB = 0.5 # Chance a clip gets a normal clip from another machine mixed in as background
+AUGMENT_NOISE_SNR_DB = (5.0, 20.0) # Range of clip-to-background level (random gain of the mixed-in clip)
+AUGMENT_FREQ_MASKS = 2 # SpecAugment frequency masks per clip
+AUGMENT_FREQ_MASK_WIDTH = 16 # Max mel bins per frequency mask
+AUGMENT_TIME_MASKS = 2 # SpecAugment time masks per clip
+AUGMENT_TIME_MASK_WIDTH = 24 # Max frames per time mask
 LEARNING_RATE = 0.001
 MODEL_SAVE_PATH = "model.h5"
 TFLITE_MODEL_PATH = "model.tflite"
+FUSED_MODEL_PATH = "model_fused" # SavedModel with in-graph preprocessing: raw waveform -> score (see fused_model.py)
+FUSED_TFLITE_PATH = "model_fused.tflite"
+TFLITE_REPORT_PATH = "tflite_report.json" # Size/latency/accuracy of each exported TFLite variant
+CALIBRATION_SAMPLES = 200 # Training clips used to calibrate int8 quantization
+TRAIN_INTRA_OP_THREADS = 0 # Threads inside one op (e.g. a conv); 0 = TensorFlow default
+TRAIN_INTER_OP_THREADS = 0 # Ops run concurrently; 0 = TensorFlow default
+TRAIN_JIT_COMPILE = False # Compile the train step with XLA
+STEPS_PER_EXECUTION = 1 # Train steps per compiled call (fewer Python round trips)
+TRAIN_PRECISION = "float32" # "float32", "mixed_bfloat16" (CPUs with AVX512-BF16/AMX) or "mixed_float16"
+TRAIN_PERF_REPORT_PATH = "training_perf.json" # Epoch times and samples/sec of every training run
+CV_FOLDS = 5 # GroupKFold folds for src.cross_validate
+CV_REPORT_PATH = "cv_report.json" # Per-fold, out-of-fold and per-machine-group cross-validation metrics
+
+# Serving configurations (overridable through environment variables)
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 32)) # Requests merged into one model call
+MAX_BATCH_WAIT_MS = float(os.environ.get("MAX_BATCH_WAIT_MS", 5)) # Longest a request waits for batch-mates
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 10 * 1024**2)) # Larger uploads get HTTP 413
+MAX_LONG_UPLOAD_BYTES = int(os.environ.get("MAX_LONG_UPLOAD_BYTES", 500 * 1024**2)) # Limit for /predict/windows
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "keras") # "keras" (.h5), "tflite" or "fused" (raw waveform in)
+TFLITE_NUM_THREADS = int(os.environ.get("TFLITE_NUM_THREADS", 1)) # Threads per TFLite interpreter
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 0)) # Seconds between model file checks (0 = off)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN") # Required by /admin/* endpoints; unset disables them
+DECODE_WORKERS = int(os.environ.get("DECODE_WORKERS", 0)) # Server processes for decode/featurize (0 = in request thread)
+MAX_INFLIGHT = int(os.environ.get("MAX_INFLIGHT", 64)) # Concurrent predictions per server process before HTTP 429
+STREAM_INTERVAL_SECONDS = float(os.environ.get("STREAM_INTERVAL_SECONDS", 1.0)) # Default spacing of /stream scores
+STREAM_IDLE_TIMEOUT = float(os.environ.get("STREAM_IDLE_TIMEOUT", 60)) # Seconds without audio before a stream is dropped
+MAX_STREAMS = int(os.environ.get("MAX_STREAMS", 64)) # Open streams per server process
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", 8)) # Gunicorn threads per worker (see gunicorn.conf.py)
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 0)) # Cached /predict results, keyed by upload hash + model version (0 = off)
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 3600)) # Seconds a cached result stays valid (0 = no expiry)
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR") # Share the cache across server processes via this directory (e.g. /dev/shm/...)
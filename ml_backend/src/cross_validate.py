@@ -0,0 +1,216 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import GroupKFold
+from src import config, feature_store, manifest as manifest_module
+from src.bench_utils import machine_info
+from src.feature_cache import FeatureCache
+
+def binary_metrics(labels, scores):
+    """Accuracy, AUC (None unless both classes are present), precision/recall/F1 of the fault class at 0.5."""
+    labels = np.asarray(labels) != 0
+    predicted = np.asarray(scores) > 0.5
+    both = len(np.unique(labels)) == 2
+    return {
+        "n": int(len(labels)),
+        "abnormal": int(labels.sum()),
+        "accuracy": float(np.mean(predicted == labels)) if len(labels) else None,
+        "auc": float(roc_auc_score(labels, scores)) if both else None,
+        "precision": float(precision_score(labels, predicted, zero_division=0)),
+        "recall": float(recall_score(labels, predicted, zero_division=0)),
+        "f1": float(f1_score(labels, predicted, zero_division=0)),
+    }
+
+def run_fold(store_dir, fold, train_idx, val_idx, epochs, batch_size, threads, augment, seed):
+    """
+    Trains and evaluates one fold in a worker process. The store is opened here as
+    memory maps, so every worker reads the same pages instead of receiving pickled
+    copies of the features. TensorFlow's thread pools are capped at `threads`
+    before it runs anything, so concurrent folds don't oversubscribe the CPU.
+    """
+    import tensorflow as tf
+    from src import augment as augment_module, input_pipeline, model as model_module, perf
+    perf.configure_threads(threads, 1)
+    if seed is not None:
+        tf.keras.utils.set_random_seed(seed)
+
+    store = feature_store.FeatureStore(store_dir)
+    augmenter = augment_module.Augmenter(store, train_idx) if augment else None
+    train_data = input_pipeline.make_dataset(store, train_idx, batch_size, training=True, seed=seed, augmenter=augmenter)
+    timer = perf.EpochTimer(batch_size, input_pipeline.epoch_size(store, train_idx))
+    model = model_module.create_model()
+    start = time.perf_counter()
+    history = model.fit(train_data, epochs=epochs, callbacks=[timer], verbose=0)
+
+    scores = np.concatenate([
+        model.predict(store.take(val_idx[i:i + 256]), verbose=0).reshape(-1)
+        for i in range(0, len(val_idx), 256)
+    ]) if len(val_idx) else np.zeros(0, dtype=np.float32)
+    return {
+        "fold": fold,
+        "train_size": int(len(train_idx)),
+        "val_size": int(len(val_idx)),
+        "seconds": time.perf_counter() - start,
+        "final_loss": float(history.history["loss"][-1]),
+        "epochs": timer.epochs,
+        "val_indices": val_idx.tolist(),
+        "scores": scores.astype(float).tolist(),
+    }
+
+def _summary(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"mean": None, "std": None}
+    return {"mean": float(np.mean(values)), "std": float(np.std(values))}
+
+def aggregate(store, folds):
+    """Per-fold, out-of-fold and per-machine-group metrics from the run_fold results."""
+    indices = np.concatenate([np.asarray(f["val_indices"], dtype=np.int64) for f in folds])
+    scores = np.concatenate([np.asarray(f["scores"]) for f in folds])
+    fold_of = np.concatenate([np.full(len(f["val_indices"]), f["fold"]) for f in folds])
+    labels, groups = store.labels[indices], store.groups[indices]
+
+    fold_rows = []
+    for f in sorted(folds, key=lambda f: f["fold"]):
+        mask = fold_of == f["fold"]
+        fold_rows.append(dict(
+            binary_metrics(labels[mask], scores[mask]),
+            fold=f["fold"], train_size=f["train_size"], seconds=f["seconds"], final_loss=f["final_loss"],
+            groups=sorted(np.unique(groups[mask]).tolist()), epochs=f["epochs"],
+        ))
+
+    group_rows = []
+    for group in sorted(np.unique(groups)):
+        mask = groups == group
+        group_scores, group_labels = scores[mask], labels[mask]
+        group_rows.append(dict(
+            binary_metrics(group_labels, group_scores),
+            group=str(group), fold=int(fold_of[mask][0]),
+            mean_score_normal=float(group_scores[group_labels == 0].mean()) if np.any(group_labels == 0) else None,
+            mean_score_abnormal=float(group_scores[group_labels != 0].mean()) if np.any(group_labels != 0) else None,
+        ))
+
+    return {
+        "folds": fold_rows,
+        "fold_summary": {metric: _summary([row[metric] for row in fold_rows]) for metric in ("accuracy", "auc", "f1")},
+        "out_of_fold": binary_metrics(labels, scores),
+        "groups": group_rows,
+        "predictions": [
+            {"path": str(store.paths[i]), "group": str(g), "label": int(y), "fold": int(k), "score": float(s)}
+            for i, g, y, k, s in zip(indices, groups, labels, fold_of, scores)
+        ],
+    }
+
+def print_report(report):
+    fmt = lambda v: f"{v:.3f}" if v is not None else "-"
+    print("\n" + "="*84)
+    print(f"{'fold':>5} {'train':>7} {'val':>6} {'abnormal':>9} {'accuracy':>9} {'AUC':>7} {'F1':>7} {'time s':>8}  val groups")
+    print("="*84)
+    for row in report["folds"]:
+        print(f"{row['fold']:>5} {row['train_size']:>7} {row['n']:>6} {row['abnormal']:>9} {fmt(row['accuracy']):>9} "
+              f"{fmt(row['auc']):>7} {fmt(row['f1']):>7} {row['seconds']:>8.1f}  {', '.join(row['groups'])}")
+    print("="*84)
+    for metric, summary in report["fold_summary"].items():
+        if summary["mean"] is not None:
+            print(f"{metric:>9}: {summary['mean']:.3f} ± {summary['std']:.3f} across folds")
+    oof = report["out_of_fold"]
+    print(f"Out-of-fold: accuracy {fmt(oof['accuracy'])}, AUC {fmt(oof['auc'])}, F1 {fmt(oof['f1'])} on {oof['n']} clips")
+
+    print(f"\n{'machine group':>24} {'fold':>5} {'n':>6} {'abnormal':>9} {'accuracy':>9} {'AUC':>7} {'score N/A':>12}")
+    for row in report["groups"]:
+        scores = f"{fmt(row['mean_score_normal'])}/{fmt(row['mean_score_abnormal'])}"
+        print(f"{row['group'][-24:]:>24} {row['fold']:>5} {row['n']:>6} {row['abnormal']:>9} "
+              f"{fmt(row['accuracy']):>9} {fmt(row['auc']):>7} {scores:>12}")
+    print("="*84)
+
+def cross_validate(dataset_paths, folds=config.CV_FOLDS, parallel=None, threads=None, epochs=config.EPOCHS,
+                   batch_size=config.BATCH_SIZE, augment=False, seed=config.TRAIN_SEED, num_workers=None,
+                   cache_dir=config.FEATURE_CACHE_DIR, store_dir=config.FEATURE_STORE_DIR,
+                   manifest_path=config.MANIFEST_PATH, report_path=config.CV_REPORT_PATH, rescan=False):
+    """
+    GroupKFold cross-validation: features are extracted once into the feature store,
+    then the folds train concurrently in `parallel` spawned processes with `threads`
+    TensorFlow threads each. Every machine group is validated in exactly one fold.
+    """
+    if isinstance(dataset_paths, str):
+        dataset_paths = [dataset_paths]
+    cache = FeatureCache(cache_dir) if cache_dir else None
+    manifest = manifest_module.open_updated(dataset_paths, manifest_path, full=rescan) if manifest_path else None
+    store = feature_store.build_feature_store(dataset_paths, store_dir, num_workers=num_workers, cache=cache, manifest=manifest)
+    if len(store) == 0:
+        print("No data found in any dataset paths!")
+        return None
+
+    n_groups = len(np.unique(store.groups))
+    if n_groups < folds:
+        print(f"❌ Only {n_groups} machine groups, can't make {folds} group folds.")
+        return None
+    splits = list(GroupKFold(n_splits=folds).split(np.zeros(len(store)), store.labels, store.groups))
+
+    cpus = os.cpu_count() or 1
+    parallel = parallel or min(folds, cpus)
+    threads = threads or max(1, cpus // parallel)
+    print(f"Cross-validating {len(store)} samples from {n_groups} machine groups: "
+          f"{folds} folds, {parallel} at a time with {threads} threads each.")
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(parallel, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(run_fold, store.store_dir, fold, train_idx, val_idx, epochs, batch_size, threads, augment,
+                        None if seed is None else seed + fold)
+            for fold, (train_idx, val_idx) in enumerate(splits)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            print(f"Fold {result['fold']} done in {result['seconds']:.1f}s")
+            results.append(result)
+    wall = time.perf_counter() - start
+
+    report = dict(
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        machine=machine_info(),
+        settings={"datasets": dataset_paths, "folds": folds, "parallel": parallel, "threads_per_fold": threads,
+                  "epochs": epochs, "batch_size": batch_size, "augment": augment, "seed": seed},
+        wall_seconds=wall,
+        **aggregate(store, results),
+    )
+    print_report(report)
+    print(f"Wall time {wall:.1f}s for {folds} folds (sum of fold times {sum(f['seconds'] for f in results):.1f}s)")
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {report_path}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Group-aware k-fold cross-validation with folds trained in parallel")
+    parser.add_argument("--dataset", nargs='+', default=config.DATASET_PATHS, help="Path(s) to dataset directory")
+    parser.add_argument("--folds", type=int, default=config.CV_FOLDS, help="Number of GroupKFold folds (machine groups never straddle folds)")
+    parser.add_argument("--parallel", type=int, default=None, help="Folds trained at once (default: min(folds, CPUs))")
+    parser.add_argument("--threads", type=int, default=None, help="TensorFlow threads per fold process (default: CPUs / parallel)")
+    parser.add_argument("--epochs", type=int, default=config.EPOCHS, help="Epochs per fold")
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_SIZE)
+    parser.add_argument("--augment", action="store_true", help="On-the-fly augmentation of training batches (see train --augment)")
+    parser.add_argument("--seed", type=int, default=config.TRAIN_SEED, help="Base seed; fold k uses seed + k")
+    parser.add_argument("--workers", type=int, default=config.NUM_WORKERS, help="Processes used for feature extraction")
+    parser.add_argument("--cache-dir", type=str, default=config.FEATURE_CACHE_DIR, help="Directory for cached features")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-extract features from audio")
+    parser.add_argument("--store-dir", type=str, default=config.FEATURE_STORE_DIR, help="Directory for the memory-mapped feature store")
+    parser.add_argument("--manifest", type=str, default=config.MANIFEST_PATH, help="Dataset manifest (SQLite) used to list files")
+    parser.add_argument("--no-manifest", action="store_true", help="Walk the dataset directories instead of using the manifest")
+    parser.add_argument("--rescan", action="store_true", help="Re-stat every file in the manifest (needed after wavs are rewritten in place)")
+    parser.add_argument("--report", type=str, default=config.CV_REPORT_PATH, help="JSON report path")
+    args = parser.parse_args()
+
+    cross_validate(args.dataset, args.folds, args.parallel, args.threads, args.epochs, args.batch_size, args.augment,
+                   args.seed, args.workers, None if args.no_cache else args.cache_dir, args.store_dir,
+                   None if args.no_manifest else args.manifest, args.report, args.rescan)
+
+if __name__ == "__main__":
+    main()
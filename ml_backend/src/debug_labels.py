@@ -1,29 +1,28 @@
 
-import os
+import sys
+from src import config, manifest as manifest_module
 
-dataset_path = r"d:\finalminorproject\dataset"
-print(f"Scanning {dataset_path}...")
+# Usage: python -m src.debug_labels [dataset ...] [--full]
+# Counts come from the dataset manifest, so only directories changed since the last run are re-scanned.
+dataset_paths = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or config.DATASET_PATHS
+print(f"Scanning {', '.join(dataset_paths)}...")
 
-counts = {0: 0, 1: 0}
-paths = {0: [], 1: []}
+manifest = manifest_module.open_updated(dataset_paths, full="--full" in sys.argv)
+counts = manifest.counts(dataset_paths)
+entries = manifest.entries(dataset_paths)
 
-for root, dirs, files in os.walk(dataset_path):
-    for file in files:
-        if file.endswith(".wav"):
-            parent_folder = os.path.basename(root).lower()
-            
-            if parent_folder == "normal":
-                label = 0
-            elif parent_folder == "abnormal" or "fault" in parent_folder:
-                label = 1
-            else:
-                print(f"Skipping ambiguous folder: {parent_folder}")
-                continue
-            
-            counts[label] += 1
-            if len(paths[label]) < 3:
-                paths[label].append(os.path.join(root, file))
+print("Counts:", {label: counts["labels"].get(label, 0) for label in (0, 1)})
+if counts["unlabelled"]:
+    print(f"Skipped {counts['unlabelled']} wav files in ambiguous folders (not normal/abnormal/fault)")
+print("Sample Normal:", [entry[0] for entry in entries if entry[1] == 0][:3])
+print("Sample Abnormal:", [entry[0] for entry in entries if entry[1] == 1][:3])
 
-print("Counts:", counts)
-print("Sample Normal:", paths[0])
-print("Sample Abnormal:", paths[1])
+print("\nPer machine (normal / abnormal):")
+machines = sorted({machine_id for machine_id, _ in counts["machines"]})
+for machine_id in machines:
+    print(f"  {machine_id}: {counts['machines'].get((machine_id, 0), 0)} / {counts['machines'].get((machine_id, 1), 0)}")
+
+audio = manifest.audio_stats(dataset_paths)
+print(f"\nSample rates: {audio['sample_rates']}")
+if audio["total_duration"] is not None:
+    print(f"Duration: {audio['total_duration'] / 3600:.1f} h total, {audio['min_duration']:.2f}-{audio['max_duration']:.2f} s per file")
@@ -0,0 +1,127 @@
+import json
+import os
+import time
+import numpy as np
+import tensorflow as tf
+from sklearn.metrics import roc_auc_score
+from src import config
+from src.backends import TFLiteBackend
+
+VARIANTS = ["float32", "dynamic", "float16", "int8"]
+
+def variant_path(variant, base_path=config.TFLITE_MODEL_PATH):
+    """model.tflite for float32, model_<variant>.tflite for the quantized variants."""
+    if variant == "float32":
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}_{variant}{ext}"
+
+def convert(model, variant="float32", representative_data=None):
+    """
+    Converts a Keras model to TFLite bytes.
+      float32: plain conversion
+      dynamic: int8 weights, float activations (no calibration needed)
+      float16: float16 weights
+      int8:    full-integer weights, activations and I/O, calibrated on representative_data
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        if representative_data is None:
+            raise ValueError("int8 quantization needs representative_data for calibration")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([sample[np.newaxis]] for sample in representative_data)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif variant != "float32":
+        raise ValueError(f"Unknown TFLite variant '{variant}' (expected one of {VARIANTS})")
+    return converter.convert()
+
+def _predict_all(predict_fn, store, indices, batch_size=256):
+    return np.concatenate([
+        np.asarray(predict_fn(store.take(indices[i:i + batch_size]))).reshape(-1)
+        for i in range(0, len(indices), batch_size)
+    ]) if len(indices) else np.zeros(0)
+
+def _scores(y_true, y_score):
+    accuracy = float(np.mean((y_score > 0.5) == (y_true != 0)))
+    # AUC is undefined when the validation split only has one class
+    auc = float(roc_auc_score(y_true, y_score)) if len(np.unique(y_true)) == 2 else None
+    return accuracy, auc
+
+def _single_clip_latency_ms(backend, runs=50):
+    clip = np.zeros((1,) + config.INPUT_SHAPE, dtype=np.float32)
+    backend.predict(clip)
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.predict(clip)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.median(latencies))
+
+def export_tflite_variants(model, store, train_idx, val_idx, variants=("float32",),
+                           base_path=config.TFLITE_MODEL_PATH, report_path=config.TFLITE_REPORT_PATH):
+    """
+    Writes each requested TFLite variant and a JSON report comparing them.
+
+    Calibration samples for int8 are drawn from the training split; accuracy/AUC
+    are measured on the validation split next to the Keras (float) model.
+    A failed float32 conversion raises (it is the model shipped to the app);
+    the quantized variants are optional and only get an "error" entry.
+    """
+    rng = np.random.default_rng(0)
+    calibration_idx = np.sort(rng.choice(train_idx, min(len(train_idx), config.CALIBRATION_SAMPLES), replace=False))
+    representative_data = store.take(calibration_idx)
+
+    y_val = store.labels[val_idx]
+    keras_accuracy, keras_auc = _scores(y_val, _predict_all(lambda x: model.predict(x, verbose=0), store, val_idx))
+    report = {
+        "validation_samples": int(len(val_idx)),
+        "keras": {"accuracy": keras_accuracy, "auc": keras_auc},
+        "variants": {},
+    }
+
+    for variant in variants:
+        path = variant_path(variant, base_path)
+        print(f"Converting {variant} TFLite model to {path}...")
+        try:
+            tflite_model = convert(model, variant, representative_data)
+        except Exception as e:
+            print(f"❌ {variant} conversion failed: {e}")
+            if variant == "float32":
+                raise
+            report["variants"][variant] = {"error": str(e)}
+            continue
+        with open(path, 'wb') as f:
+            f.write(tflite_model)
+
+        backend = TFLiteBackend(path, num_threads=1)
+        accuracy, auc = _scores(y_val, _predict_all(backend.predict, store, val_idx))
+        report["variants"][variant] = {
+            "path": path,
+            "size_kb": os.path.getsize(path) / 1024,
+            "latency_ms": _single_clip_latency_ms(backend),
+            "accuracy": accuracy,
+            "auc": auc,
+            "accuracy_delta": accuracy - keras_accuracy,
+        }
+
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "="*62)
+    print(f"{'variant':>8} {'size KB':>10} {'latency ms':>11} {'accuracy':>9} {'AUC':>7} {'Δacc':>7}")
+    for variant, r in report["variants"].items():
+        if "error" in r:
+            print(f"{variant:>8}  failed: {r['error'][:40]}")
+            continue
+        auc = f"{r['auc']:.3f}" if r["auc"] is not None else "n/a"
+        print(f"{variant:>8} {r['size_kb']:>10.0f} {r['latency_ms']:>11.2f} {r['accuracy']:>9.3f} {auc:>7} {r['accuracy_delta']:>+7.3f}")
+    print("="*62)
+    print(f"Report written to {report_path}")
+    return report
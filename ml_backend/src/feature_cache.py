@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+from src import config
+
+def config_fingerprint():
+    """Short hash of every config value that changes what extract_features produces."""
+    params = {
+        "sample_rate": config.SAMPLE_RATE,
+        "duration": config.DURATION,
+        "n_mels": config.N_MELS,
+        "n_fft": config.N_FFT,
+        "hop_length": config.HOP_LENGTH,
+        "input_shape": list(config.INPUT_SHAPE),
+        "feature_version": config.FEATURE_VERSION,
+    }
+    if config.RESAMPLE_QUALITY != "soxr_hq":
+        # Only non-default resamplers change the hash, so caches built before the option existed stay valid
+        params["resample_quality"] = config.RESAMPLE_QUALITY
+    blob = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:12]
+
+class FeatureCache:
+    """
+    Persistent on-disk cache of extracted features.
+
+    Layout: <cache_dir>/<config fingerprint>/<key[:2]>/<key>.npy, where key hashes
+    the absolute file path, size and mtime. Editing a wav changes its key; changing
+    a preprocessing config value changes the fingerprint, so stale entries are never
+    read and are the first to go when the size cap is hit. Remaining entries are
+    evicted least-recently-used first (hits refresh the entry's mtime).
+    """
+    def __init__(self, cache_dir=config.FEATURE_CACHE_DIR, max_bytes=config.FEATURE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fingerprint = config_fingerprint()
+        self.root = os.path.join(cache_dir, self.fingerprint)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._scan())
+
+    def _key(self, file_path):
+        stat = os.stat(file_path)
+        ident = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, file_path):
+        key = self._key(file_path)
+        return os.path.join(self.root, key[:2], key + ".npy")
+
+    def contains(self, file_path):
+        try:
+            found = os.path.exists(self._entry_path(file_path))
+        except OSError:
+            found = False
+        if not found:
+            self.misses += 1
+        return found
+
+    def get(self, file_path):
+        """Returns cached features for file_path, or None on a miss."""
+        try:
+            entry = self._entry_path(file_path)
+            features = np.load(entry)
+            os.utime(entry) # Mark as recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return features
+
+    def put(self, file_path, features):
+        entry = self._entry_path(file_path)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # Write-then-rename so readers never see a half-written entry
+        tmp_path = f"{entry}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(features))
+        if os.path.exists(entry):
+            self._size -= os.path.getsize(entry)
+        os.replace(tmp_path, entry)
+        self._size += os.path.getsize(entry)
+        if self.max_bytes and self._size > self.max_bytes:
+            self.evict()
+
+    def _scan(self):
+        """Yields (path, size, mtime) for every entry under every fingerprint."""
+        for dirpath, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """Deletes entries until the cache is back under 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        # Stale fingerprints first, then oldest-used
+        entries = sorted(self._scan(), key=lambda e: (e[0].startswith(self.root + os.sep), e[2]))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        print(f"Feature cache: evicted {removed} entries ({self._size / 1024**2:.1f} MB kept).")
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+        self._size = 0
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import shutil
+import zlib
+import numpy as np
+from src import config, preprocess
+from src.feature_cache import config_fingerprint
+
+STORE_DTYPE = np.float32
+
+def dataset_group_prefix(dataset_path):
+    """Stable per-dataset prefix so machine IDs from different datasets stay distinct."""
+    return str(zlib.crc32(os.path.abspath(dataset_path).encode("utf-8")) % 10000)
+
+class FeatureStoreWriter:
+    """Appends features into fixed-size .npy shards, holding at most one shard in RAM."""
+    def __init__(self, store_dir, shard_size=config.FEATURE_STORE_SHARD_SIZE, shape=config.INPUT_SHAPE):
+        self.store_dir = store_dir
+        self.shard_size = shard_size
+        self.shape = tuple(shape)
+        self.labels = []
+        self.groups = []
+        self.paths = []
+        self._shard = np.empty((shard_size,) + self.shape, dtype=STORE_DTYPE)
+        self._fill = 0
+        self._num_shards = 0
+        os.makedirs(store_dir, exist_ok=True)
+
+    def append(self, features, label, group, path):
+        self._shard[self._fill] = features
+        self._fill += 1
+        self.labels.append(label)
+        self.groups.append(group)
+        self.paths.append(path)
+        if self._fill == self.shard_size:
+            self._flush()
+
+    def _flush(self):
+        if self._fill == 0:
+            return
+        np.save(os.path.join(self.store_dir, f"shard_{self._num_shards:05d}.npy"), self._shard[:self._fill])
+        self._num_shards += 1
+        self._fill = 0
+
+    def close(self, **meta):
+        """Writes the last shard, the label/group/path index and meta.json."""
+        self._flush()
+        np.savez(
+            os.path.join(self.store_dir, "index.npz"),
+            labels=np.array(self.labels, dtype=np.int8),
+            groups=np.array(self.groups, dtype=str),
+            paths=np.array(self.paths, dtype=str),
+        )
+        meta.update({
+            "num_samples": len(self.labels),
+            "num_shards": self._num_shards,
+            "shard_size": self.shard_size,
+            "shape": list(self.shape),
+            "dtype": np.dtype(STORE_DTYPE).name,
+        })
+        with open(os.path.join(self.store_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+class FeatureStore:
+    """
+    Read-only view over a directory of memory-mapped feature shards.
+    labels/groups/paths are small in-RAM arrays; features are only read
+    (via take) for the rows a batch actually needs.
+    """
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        index = np.load(os.path.join(store_dir, "index.npz"))
+        self.labels = index["labels"].astype(np.int64)
+        self.groups = index["groups"]
+        self.paths = index["paths"]
+        self.shape = tuple(self.meta["shape"])
+        self.shard_size = self.meta["shard_size"]
+        self._shards = [
+            np.load(os.path.join(store_dir, f"shard_{i:05d}.npy"), mmap_mode="r")
+            for i in range(self.meta["num_shards"])
+        ]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def take(self, indices):
+        """Gathers the rows at indices (in that order) into a new float32 array."""
+        indices = np.asarray(indices, dtype=np.int64)
+        out = np.empty((len(indices),) + self.shape, dtype=STORE_DTYPE)
+        shard_ids = indices // self.shard_size
+        offsets = indices % self.shard_size
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            out[mask] = self._shards[shard_id][offsets[mask]]
+        return out
+
+def _sources_signature(entries):
+    """Hash of every source file's path, label, group, size and mtime."""
+    digest = hashlib.sha1()
+    for file_path, label, group, size, mtime_ns in entries:
+        digest.update(f"{file_path}|{label}|{group}|{size}|{mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+def build_feature_store(dataset_paths, store_dir=config.FEATURE_STORE_DIR, num_workers=None, cache=None, manifest=None,
+                        failures=None):
+    """
+    Extracts features for every wav under dataset_paths into a FeatureStore at store_dir.
+    If the store already holds exactly these files (same sizes/mtimes) under the
+    current preprocessing config, it is reused as-is. With an up-to-date
+    DatasetManifest, files, sizes and mtimes come from it instead of walking the tree.
+    Pass a list as failures to get (file_path, error) for every file left out of the
+    store; they are kept in meta.json, so a reused store reports them too.
+    """
+    if failures is None:
+        failures = []
+    if isinstance(dataset_paths, str):
+        dataset_paths = [dataset_paths]
+    
+    entries = []
+    for path in dataset_paths:
+        prefix = dataset_group_prefix(path)
+        if manifest is not None:
+            for file_path, label, machine_id, size, mtime_ns in manifest.entries(path):
+                entries.append((file_path, label, f"{prefix}_{machine_id}", size, mtime_ns))
+            continue
+        print(f"Scanning {path}...")
+        for file_path, label, machine_id in preprocess.find_audio_files(path):
+            stat = os.stat(file_path)
+            entries.append((file_path, label, f"{prefix}_{machine_id}", stat.st_size, stat.st_mtime_ns))
+    
+    signature = _sources_signature(entries)
+    fingerprint = config_fingerprint()
+    meta_path = os.path.join(store_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("sources") == signature and meta.get("fingerprint") == fingerprint:
+            print(f"Feature store at {store_dir} is up to date ({meta['num_samples']} samples).")
+            failures.extend(tuple(failure) for failure in meta.get("failures", []))
+            return FeatureStore(store_dir)
+    
+    # Build next to the old store and swap at the end, so a crash leaves the old one intact
+    tmp_dir = store_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    writer = FeatureStoreWriter(tmp_dir)
+    skipped = []
+    
+    file_paths = [entry[0] for entry in entries]
+    for (file_path, label, group, _, _), (_, features, error) in zip(entries, preprocess.iter_features(file_paths, num_workers, cache)):
+        if error is not None:
+            print(f"Error processing {file_path}: {error}")
+            skipped.append((file_path, error))
+            continue
+        writer.append(features, label, group, file_path)
+    
+    writer.close(sources=signature, fingerprint=fingerprint, dataset_paths=list(dataset_paths), failures=skipped)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    
+    print(f"Processed {len(writer.labels)} samples into {store_dir}.")
+    if skipped:
+        print(f"Failed to process {len(skipped)} of {len(entries)} files.")
+    failures.extend(skipped)
+    return FeatureStore(store_dir)
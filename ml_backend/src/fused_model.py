@@ -0,0 +1,75 @@
+import argparse
+import os
+import numpy as np
+import tensorflow as tf
+from src import config, export
+from src.mel_engine import get_engine
+
+class MelFrontEnd(tf.keras.layers.Layer):
+    """
+    TensorFlow port of MelEngine as a Keras layer: (batch, CLIP_SAMPLES) float32 waveforms
+    at SAMPLE_RATE -> (batch, N_MELS, INPUT_SHAPE[1], 1) standardized log-mel features.
+
+    Same steps and constants as the NumPy path: zero centre padding of n_fft // 2,
+    periodic Hann window, power spectrum, librosa's Slaney filterbank,
+    power_to_db(ref=max, top_db=80) and per-clip standardization.
+    """
+    def __init__(self, amin=1e-10, top_db=80.0, **kwargs):
+        super().__init__(**kwargs)
+        engine = get_engine()
+        self.n_fft = engine.n_fft
+        self.hop_length = engine.hop_length
+        self.amin = amin
+        self.top_db = top_db
+        self.window = engine.window
+        self.filterbank_t = engine.filterbank_t
+
+    def call(self, audio):
+        pad = self.n_fft // 2
+        padded = tf.pad(audio, [[0, 0], [pad, pad]])
+        frames = tf.signal.frame(padded, self.n_fft, self.hop_length) * self.window
+        spectrum = tf.signal.rfft(frames)
+        power = tf.math.real(spectrum) ** 2 + tf.math.imag(spectrum) ** 2
+        mel = tf.transpose(tf.matmul(power, self.filterbank_t), [0, 2, 1]) # (batch, n_mels, frames)
+
+        to_db = lambda x: 10.0 * tf.math.log(tf.maximum(self.amin, x)) / np.log(10.0)
+        log_spec = to_db(mel) - to_db(tf.reduce_max(mel, axis=[1, 2], keepdims=True))
+        log_spec = tf.maximum(log_spec, tf.reduce_max(log_spec, axis=[1, 2], keepdims=True) - self.top_db)
+        mean = tf.reduce_mean(log_spec, axis=[1, 2], keepdims=True)
+        std = tf.math.reduce_std(log_spec, axis=[1, 2], keepdims=True)
+        return tf.expand_dims((log_spec - mean) / (std + 1e-8), -1)
+
+    def compute_output_shape(self, input_shape):
+        return (input_shape[0], len(self.filterbank_t[0]), 1 + input_shape[1] // self.hop_length, 1)
+
+def build_fused_model(model):
+    """Raw waveform -> fault score in one graph: MelFrontEnd followed by the trained CNN."""
+    audio = tf.keras.Input(shape=(config.CLIP_SAMPLES,), name="audio")
+    score = model(MelFrontEnd(name="mel_front_end")(audio))
+    return tf.keras.Model(audio, score, name="fused_model")
+
+def export_fused(model, savedmodel_path=config.FUSED_MODEL_PATH, tflite_path=config.FUSED_TFLITE_PATH):
+    """Writes model with in-graph preprocessing as a SavedModel (serving_default: audio -> score) and a TFLite file."""
+    fused = build_fused_model(model)
+    fused.export(savedmodel_path)
+    print(f"Saved fused SavedModel to {savedmodel_path}")
+
+    if tflite_path:
+        with open(tflite_path, "wb") as f:
+            f.write(export.convert(fused))
+        print(f"Saved fused TFLite model to {tflite_path} ({os.path.getsize(tflite_path) / 1024**2:.1f} MB)")
+    return fused
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the trained CNN with in-graph preprocessing (raw waveform -> score)")
+    parser.add_argument("--model", type=str, default=config.MODEL_SAVE_PATH, help="Trained Keras .h5 model")
+    parser.add_argument("--output", type=str, default=config.FUSED_MODEL_PATH, help="SavedModel directory to write")
+    parser.add_argument("--tflite", type=str, default=config.FUSED_TFLITE_PATH, help="TFLite file to write ('' to skip)")
+    args = parser.parse_args()
+
+    model = tf.keras.models.load_model(args.model)
+    export_fused(model, args.output, args.tflite)
+    print("Check feature/score parity with: python -m src.parity --model", args.model, "--fused", args.output)
+
+if __name__ == "__main__":
+    main()
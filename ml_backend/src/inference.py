@@ -1,81 +1,251 @@
 
-    import argparse
-    import numpy as np
-    import tensorflow as tf
-    import os
-    from src import config, preprocess
-
-    def predict_single(file_path, model):
-        file_path = file_path.strip().strip('"').strip("'")
-        
-        if not os.path.exists(file_path):
-            print(f"❌ Error: File not found: {file_path}")
-            return
-            
-        if os.path.isdir(file_path):
-            print(f"❌ Error: '{file_path}' is a folder, not a file. Please enter a path to a .wav file.")
-            return
-
-        print(f"Processing {file_path}...")
-        audio = preprocess.load_audio(file_path)
-        if audio is None:
-            print("❌ Error: Could not load audio file.")
-            return
-            
+import argparse
+import csv
+import glob
+import json
+import numpy as np
+import os
+import time
+from src import backends, config, preprocess, streaming
+
+RESULT_FIELDS = ["path", "score", "label", "is_fault", "predict_ms", "error"]
+
+def predict_single(file_path, model):
+    file_path = file_path.strip().strip('"').strip("'")
+
+    if not os.path.exists(file_path):
+        print(f"❌ Error: File not found: {file_path}")
+        return
+
+    if os.path.isdir(file_path):
+        print(f"❌ Error: '{file_path}' is a folder, not a file. Please enter a path to a .wav file.")
+        return
+
+    print(f"Processing {file_path}...")
+    audio = preprocess.load_audio(file_path)
+    if audio is None:
+        print("❌ Error: Could not load audio file.")
+        return
+
+    if model.input_kind == "waveform":
+        features = preprocess.fix_length(audio)[np.newaxis] # Preprocessing runs inside the model
+    else:
         features = preprocess.extract_features(audio)
         features = np.expand_dims(features, axis=0) # Add batch dimension
-        
-        # Resize if needed
-        if features.shape[1:3] != config.INPUT_SHAPE[0:2]:
-            features = tf.image.resize(features, (config.INPUT_SHAPE[0], config.INPUT_SHAPE[1])).numpy()
-
-        prediction = model.predict(features, verbose=0)
-        score = prediction[0][0]
-        
-        # Calculate Confidence for the predicted class
-        if score > 0.5:
-            confidence = score * 100
-            label = "🔴 MACHINE STATUS: FAULT DETECTED (Abnormal)"
-        else:
-            confidence = (1 - score) * 100
-            label = "🟢 MACHINE STATUS: OK (Normal)"
-        
-        # Clear Binary Output
-        print("\n" + "="*30)
-        print(f" Confidence Score: {int(confidence)}%")
-        print("="*30)
-        print(label)
-        print("="*30 + "\n")
-
-    def main():
-        parser = argparse.ArgumentParser(description="Predict Machine Fault from Audio")
-        parser.add_argument("--model", type=str, default=config.MODEL_SAVE_PATH, help="Path to saved model")
-        # File is optional now
-        parser.add_argument("file", type=str, nargs='?', help="Path to the wav file")
-        
-        args = parser.parse_args()
-        
-        print(f"Loading model from {args.model}...")
-        try:
-            model = tf.keras.models.load_model(args.model)
-        except:
-            print("Model not found. Please train the model first.")
-            return
-
-        # If file provided in args, run that input
-        if args.file:
-            predict_single(args.file, model)
+
+    prediction = model.predict(features)
+    score = prediction[0][0]
+
+    # Calculate Confidence for the predicted class
+    if score > 0.5:
+        confidence = score * 100
+        label = "🔴 MACHINE STATUS: FAULT DETECTED (Abnormal)"
+    else:
+        confidence = (1 - score) * 100
+        label = "🟢 MACHINE STATUS: OK (Normal)"
+
+    # Clear Binary Output
+    print("\n" + "="*30)
+    print(f" Confidence Score: {int(confidence)}%")
+    print("="*30)
+    print(label)
+    print("="*30 + "\n")
+
+def predict_windows(file_path, model, hop_seconds=config.WINDOW_HOP_SECONDS):
+    """Scores a whole (long) recording as overlapping windows instead of only its first DURATION seconds."""
+    file_path = file_path.strip().strip('"').strip("'")
+    if not os.path.isfile(file_path):
+        print(f"❌ Error: File not found: {file_path}")
+        return
+
+    print(f"Processing {file_path} in {config.DURATION}s windows every {hop_seconds}s...")
+    try:
+        result = streaming.score_windows(streaming.iter_audio_blocks(file_path), model, hop_seconds)
+    except Exception as e:
+        print(f"❌ Error: Could not score audio file: {e}")
+        return
+
+    for window in result["windows"]:
+        marker = "🔴" if window["score"] > 0.5 else "🟢"
+        print(f"  {window['start']:>9.2f}s - {window['end']:>9.2f}s  {marker} {window['score']:.3f}")
+
+    print("\n" + "="*30)
+    print(f" Windows: {result['num_windows']}")
+    print(f" Max Score: {result['max']:.3f}")
+    print(f" Mean Score: {result['mean']:.3f}")
+    print(f" Faulty Windows: {result['fraction_faulty'] * 100:.1f}%")
+    print("="*30 + "\n")
+    return result
+
+def collect_inputs(inputs):
+    """Expands directories (recursively), glob patterns and @filelist.txt entries into sorted, de-duplicated wav paths."""
+    paths = []
+    for item in inputs:
+        if item.startswith("@"):
+            with open(item[1:]) as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        elif os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                paths.extend(os.path.join(root, file) for file in sorted(files) if file.lower().endswith(".wav"))
         else:
-            # Interactive Mode
-            print("\n--- Interactive Inference Mode ---")
-            print("Enter path to audio file (or 'q' to quit)")
-            while True:
-                user_input = input("\nPath: ")
-                if user_input.lower() in ['q', 'quit', 'exit']:
-                    break
-                if user_input.strip() == "":
+            matches = sorted(glob.glob(item, recursive=True))
+            paths.extend(matches if matches else [item])
+    return list(dict.fromkeys(paths))
+
+def _already_scored(output_path):
+    """Paths scored successfully in an earlier (possibly interrupted) results file; rows with an error are retried."""
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, newline="") as f:
+        if output_path.endswith(".csv"):
+            return {row["path"] for row in csv.DictReader(f) if not row.get("error")}
+        scored = set()
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if not row.get("error"):
+                scored.add(row["path"])
+        return scored
+
+def _drop_partial_line(output_path):
+    """Truncates a half-written last line (from a crash) so appended rows start on a fresh line."""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(position, 64 * 1024)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position != end:
+            f.truncate(position)
+
+def predict_batch(inputs, model, output_path, batch_size=config.BATCH_SIZE, num_workers=None):
+    """
+    Scores many files: decodes/featurizes in a process pool, predicts in batches
+    of batch_size and appends one result per file to output_path (.jsonl or .csv).
+    Files already scored in output_path are skipped, so an interrupted run can be
+    restarted; files that failed are tried again and get a new row.
+    """
+    paths = collect_inputs(inputs)
+    _drop_partial_line(output_path)
+    done = _already_scored(output_path)
+    todo = [path for path in paths if path not in done]
+    print(f"Found {len(paths)} files, {len(done & set(paths))} already scored, {len(todo)} to go.")
+    if not todo:
+        return
+
+    is_csv = output_path.endswith(".csv")
+    write_header = is_csv and (not os.path.exists(output_path) or os.path.getsize(output_path) == 0)
+    start = time.perf_counter()
+    scored = 0
+
+    with open(output_path, "a", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS) if is_csv else None
+        if write_header:
+            writer.writeheader()
+
+        def write(rows):
+            for row in rows:
+                if is_csv:
+                    writer.writerow(row)
+                else:
+                    out.write(json.dumps(row) + "\n")
+            out.flush()
+
+        # Work through the list in blocks so featurized clips never pile up in RAM
+        block_size = max(batch_size, 1024)
+        for block_start in range(0, len(todo), block_size):
+            block = todo[block_start:block_start + block_size]
+            pending_paths, pending_features = [], []
+            for path, features, error in preprocess.iter_features(block, num_workers):
+                if error is not None:
+                    write([{"path": path, "score": None, "label": None, "is_fault": None, "predict_ms": None, "error": error}])
                     continue
-                predict_single(user_input, model)
+                pending_paths.append(path)
+                pending_features.append(features)
+                if len(pending_paths) == batch_size:
+                    write(_score_batch(model, pending_paths, pending_features))
+                    scored += len(pending_paths)
+                    pending_paths, pending_features = [], []
+            if pending_paths:
+                write(_score_batch(model, pending_paths, pending_features))
+                scored += len(pending_paths)
+            elapsed = time.perf_counter() - start
+            print(f"Scored {scored}/{len(todo)} files ({scored / elapsed:.1f} files/sec)")
+
+    print(f"Results written to {output_path}")
+
+def _score_batch(model, paths, features):
+    start = time.perf_counter()
+    scores = np.asarray(model.predict(np.stack(features))).reshape(-1)
+    per_file_ms = (time.perf_counter() - start) * 1000 / len(paths)
+    return [{
+        "path": path,
+        "score": float(score),
+        "label": "FAULT" if score > 0.5 else "NORMAL",
+        "is_fault": bool(score > 0.5),
+        "predict_ms": per_file_ms,
+        "error": None,
+    } for path, score in zip(paths, scores)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict Machine Fault from Audio")
+    parser.add_argument("--backend", type=str, default=config.INFERENCE_BACKEND, choices=sorted(backends.BACKENDS), help="Inference runtime")
+    parser.add_argument("--model", type=str, default=None, help="Path to saved model (default depends on --backend)")
+    parser.add_argument("--threads", type=int, default=config.TFLITE_NUM_THREADS, help="TFLite interpreter threads (tflite, fused .tflite)")
+    # File is optional now
+    parser.add_argument("file", type=str, nargs='?', help="Path to the wav file")
+    parser.add_argument("--windows", action="store_true", help="Score the whole recording in overlapping windows")
+    parser.add_argument("--hop", type=float, default=config.WINDOW_HOP_SECONDS, help="Seconds between windows (with --windows)")
+    parser.add_argument("--batch", nargs='+', default=None, help="Score many files: directories, glob patterns or @filelist.txt")
+    parser.add_argument("--output", type=str, default="predictions.jsonl", help="Batch results file (.jsonl or .csv), resumed if it exists")
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_SIZE, help="Clips per model call in batch mode")
+    parser.add_argument("--workers", type=int, default=config.NUM_WORKERS, help="Decode/featurize processes in batch mode")
+
+    args = parser.parse_args()
+
+    model_path = args.model or backends.default_model_path(args.backend)
+    print(f"Loading {args.backend} model from {model_path}...")
+    try:
+        if args.backend in ("tflite", "fused"):
+            model = backends.load_backend(args.backend, model_path, num_threads=args.threads)
+        else:
+            model = backends.load_backend(args.backend, model_path)
+    except:
+        print("Model not found. Please train the model first.")
+        return
+
+    if model.input_kind != "features" and (args.batch or args.windows):
+        print("❌ Error: --batch and --windows featurize outside the model; use the keras or tflite backend.")
+        return
+
+    if args.batch:
+        predict_batch(args.batch, model, args.output, args.batch_size, args.workers)
+    # If file provided in args, run that input
+    elif args.file and args.windows:
+        predict_windows(args.file, model, args.hop)
+    elif args.file:
+        predict_single(args.file, model)
+    else:
+        # Interactive Mode
+        print("\n--- Interactive Inference Mode ---")
+        print("Enter path to audio file (or 'q' to quit)")
+        while True:
+            user_input = input("\nPath: ")
+            if user_input.lower() in ['q', 'quit', 'exit']:
+                break
+            if user_input.strip() == "":
+                continue
+            predict_single(user_input, model)
 
-    if __name__ == "__main__":
-        main()
+if __name__ == "__main__":
+    main()
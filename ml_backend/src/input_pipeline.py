@@ -0,0 +1,79 @@
+import numpy as np
+import tensorflow as tf
+from src import config
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+def _index_stream(indices, shuffle_buffer, seed):
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    return ds.shuffle(min(len(indices), shuffle_buffer), seed=seed, reshuffle_each_iteration=True)
+
+def epoch_size(store, indices, balance=True):
+    """Samples in one epoch of make_dataset(store, indices, training=True, balance=balance)."""
+    labels = store.labels[np.asarray(indices, dtype=np.int64)]
+    positives = int(np.count_nonzero(labels))
+    negatives = len(labels) - positives
+    if balance and positives > 0 and negatives > 0:
+        return 2 * max(positives, negatives)
+    return len(labels)
+
+def make_dataset(store, indices, batch_size=config.BATCH_SIZE, training=False, balance=True,
+                 shuffle_buffer=config.SHUFFLE_BUFFER, seed=None, augmenter=None):
+    """
+    Builds a tf.data pipeline that streams (features, labels) batches out of a FeatureStore.
+
+    Only indices flow through shuffle/sampling; features are gathered from the
+    memory-mapped shards per batch in parallel map calls and prefetched, so RAM
+    use is a few batches regardless of dataset size.
+
+    With training=True and balance=True the two classes are drawn 50/50 from
+    independently shuffled, repeated index streams (oversampling without copies).
+    An epoch is as long as the old explicit oversampling: 2 x the majority class.
+
+    With training=True and an augment.Augmenter, every batch is augmented after
+    loading (its background clips are gathered in the same call). Each batch gets
+    its own stateless seed pair, so a seeded pipeline is reproducible.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    labels = store.labels[indices]
+    pos_idx = indices[labels != 0]
+    neg_idx = indices[labels == 0]
+
+    if training and balance and len(pos_idx) > 0 and len(neg_idx) > 0:
+        streams = [
+            _index_stream(pos_idx, shuffle_buffer, seed).repeat(),
+            _index_stream(neg_idx, shuffle_buffer, seed).repeat(),
+        ]
+        ds = tf.data.Dataset.sample_from_datasets(streams, weights=[0.5, 0.5], seed=seed)
+        ds = ds.take(epoch_size(store, indices, balance))
+    elif training:
+        ds = _index_stream(indices, shuffle_buffer, seed)
+    else:
+        ds = tf.data.Dataset.from_tensor_slices(indices)
+
+    feature_shape = (None,) + tuple(store.shape)
+
+    def load_batch(batch_indices):
+        features, batch_labels = tf.numpy_function(
+            lambda idx: (store.take(idx), store.labels[idx].astype(np.float32)),
+            [batch_indices],
+            [tf.float32, tf.float32],
+        )
+        features.set_shape(feature_shape)
+        batch_labels.set_shape((None,))
+        return features, batch_labels
+
+    ds = ds.batch(batch_size)
+    if training and augmenter is not None:
+        def load_augmented(batch_indices, batch_seed):
+            noise_seed, augment_seed = tf.unstack(tf.random.experimental.stateless_split(batch_seed, 2))
+            noise_indices, use_noise = augmenter.pick_noise(batch_indices, noise_seed)
+            features, batch_labels = load_batch(batch_indices)
+            noise, _ = load_batch(noise_indices)
+            return augmenter(features, noise, use_noise, augment_seed), batch_labels
+
+        ds = tf.data.Dataset.zip((ds, tf.data.Dataset.random(seed=seed).batch(2)))
+        ds = ds.map(load_augmented, num_parallel_calls=AUTOTUNE, deterministic=seed is not None)
+    else:
+        ds = ds.map(load_batch, num_parallel_calls=AUTOTUNE, deterministic=seed is not None)
+    return ds.prefetch(AUTOTUNE)
@@ -0,0 +1,454 @@
+import argparse
+import collections
+import glob
+import html
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src import config
+from src.bench_utils import machine_info, write_wav
+
+RETRY_AFTER_SECONDS = 1
+PROFILES = ["closed", "constant", "ramp", "burst"]
+STUB_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "backend", "app.py")
+# Upload form field each server expects
+TARGETS = {
+    "server_app": {"field": "file"},
+    "stub": {"field": "audio"}, # backend/app.py (accepts uploads, no model)
+}
+
+def _multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: audio/wav\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def _post(url, body, content_type, timeout):
+    """Returns (status, per-stage timing in ms or None). Asks the server for its stage breakdown (X-Timing)."""
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type, "X-Timing": "1"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            payload = resp.read()
+            try:
+                timing = json.loads(payload).get("timing")
+            except (ValueError, AttributeError):
+                timing = None
+            return resp.status, timing
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except Exception:
+        return "error", None
+
+def _wait_ready(base_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/", timeout=2):
+                return True
+        except urllib.error.HTTPError:
+            return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+def start_server(target, url):
+    """Launches src.server_app or backend/app.py on url's port and returns the Popen."""
+    host, port = url.split("://")[-1].split(":")
+    if target == "stub":
+        return subprocess.Popen([sys.executable, STUB_APP], env=dict(os.environ, PORT=str(int(port))))
+    code = f"from src.server_app import app; app.run(host='{host}', port={int(port)}, threaded=True)"
+    return subprocess.Popen([sys.executable, "-c", code])
+
+class ProcessSampler:
+    """
+    Samples CPU % and RSS of a process and all its descendants (e.g. the decode pool)
+    from /proc every interval seconds on a background thread. Linux only; without
+    /proc (or a pid) it records nothing.
+    """
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = [] # (perf_counter time, cpu percent, rss MB)
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._page_mb = (os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096) / 1024**2
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="process-sampler", daemon=True)
+
+    def _tree(self):
+        children = collections.defaultdict(list)
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                    children[ppid].append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    continue
+        pids, stack = [], [self.pid]
+        while stack:
+            pid = stack.pop()
+            pids.append(pid)
+            stack.extend(children.get(pid, []))
+        return pids
+
+    def _read(self):
+        cpu_ticks, rss_pages = 0, 0
+        for pid in self._tree():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                with open(f"/proc/{pid}/statm") as f:
+                    rss_pages += int(f.read().split()[1])
+                cpu_ticks += int(fields[11]) + int(fields[12]) # utime + stime
+            except (OSError, IndexError, ValueError):
+                continue
+        return cpu_ticks, rss_pages
+
+    def _run(self):
+        last_time, (last_ticks, _) = time.perf_counter(), self._read()
+        while not self._stop.wait(self.interval):
+            now, (ticks, pages) = time.perf_counter(), self._read()
+            cpu = max(0.0, (ticks - last_ticks) / self._ticks / (now - last_time) * 100)
+            self.samples.append((now, cpu, pages * self._page_mb))
+            last_time, last_ticks = now, ticks
+
+    def start(self):
+        if self.pid is not None and os.path.isdir(f"/proc/{self.pid}"):
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def summary(self, start, end):
+        """Mean/max CPU % (100 = one core) and max RSS between two perf_counter times."""
+        window = [s for s in self.samples if start <= s[0] <= end]
+        if not window:
+            return None
+        return {
+            "cpu_mean_pct": float(np.mean([s[1] for s in window])),
+            "cpu_max_pct": float(max(s[1] for s in window)),
+            "rss_max_mb": float(max(s[2] for s in window)),
+        }
+
+def arrival_times(profile, rate, duration, rate_end=None, burst_rate=None, burst_seconds=2.0, burst_every=10.0, seed=0):
+    """
+    Poisson arrival offsets (seconds) for an open-loop run. constant: `rate` req/s;
+    ramp: linear from rate to rate_end; burst: rate, with burst_rate for the last
+    burst_seconds of every burst_every seconds. Time-varying rates use thinning.
+    """
+    def rate_at(t):
+        if profile == "ramp":
+            return rate + (rate_end - rate) * t / duration
+        if profile == "burst" and t % burst_every >= burst_every - burst_seconds:
+            return burst_rate
+        return rate
+
+    rng = np.random.default_rng(seed)
+    peak = max(rate, rate_end or 0, burst_rate or 0)
+    times, t = [], 0.0
+    while True:
+        t += rng.exponential(1 / peak)
+        if t >= duration:
+            return times
+        if rng.random() < rate_at(t) / peak:
+            times.append(t)
+
+def run_open(url, uploads, times, max_outstanding=256, timeout=30):
+    """
+    Open loop: sends request i at times[i] whether or not earlier ones have returned.
+    Latency is measured from the scheduled send time, so queueing in the client
+    (more than max_outstanding requests pending) counts against the server, as a real
+    arrival would. Returns (records, wall seconds); records are (offset, ms, status, timing).
+    """
+    records = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def send(offset, upload):
+        status, timing = _post(url, upload[0], upload[1], timeout)
+        elapsed = (time.perf_counter() - (start + offset)) * 1000
+        with lock:
+            records.append((offset, elapsed, status, timing))
+
+    with ThreadPoolExecutor(max_outstanding) as pool:
+        for i, offset in enumerate(times):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, offset, uploads[i % len(uploads)])
+    return records, time.perf_counter() - start
+
+def run(url, uploads, concurrency, duration, timeout=30):
+    """Closed loop: each of `concurrency` clients sends its next request as soon as the last one returns."""
+    records = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    stop_at = start + duration
+
+    def client(index):
+        i = index
+        while time.perf_counter() < stop_at:
+            t = time.perf_counter()
+            status, timing = _post(url, *uploads[i % len(uploads)], timeout)
+            with lock:
+                records.append((t - start, (time.perf_counter() - t) * 1000, status, timing))
+            i += concurrency
+            if status == 429:
+                time.sleep(RETRY_AFTER_SECONDS) # Honour the server's backpressure like a real client would
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return records, time.perf_counter() - start
+
+def _percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    return {f"p{q}": float(np.percentile(values, q)) for q in (50, 95, 99)}
+
+def summarize(records, wall, bucket_seconds=5.0):
+    """Throughput, error rate, end-to-end and per-stage latency percentiles, plus a per-bucket timeline."""
+    statuses = collections.Counter(str(r[2]) for r in records)
+    ok = [r for r in records if r[2] == 200]
+    stages = collections.defaultdict(list)
+    for r in ok:
+        for stage, ms in (r[3] or {}).items():
+            if stage != "batch_size":
+                stages[stage].append(ms)
+
+    timeline = []
+    last_offset = max((r[0] for r in records), default=0.0)
+    for bucket_start in np.arange(0, max(last_offset, 1e-9), bucket_seconds):
+        bucket = [r for r in records if bucket_start <= r[0] < bucket_start + bucket_seconds]
+        bucket_ok = [r[1] for r in bucket if r[2] == 200]
+        timeline.append({
+            "start_s": float(bucket_start),
+            "offered_per_sec": len(bucket) / bucket_seconds,
+            "ok_per_sec": len(bucket_ok) / bucket_seconds,
+            "error_rate": 1 - len(bucket_ok) / len(bucket) if bucket else 0.0,
+            "p99_ms": _percentiles(bucket_ok)["p99"],
+        })
+
+    return dict(
+        requests=len(records),
+        ok_per_sec=len(ok) / wall if wall else 0.0,
+        error_rate=1 - len(ok) / len(records) if records else 0.0,
+        statuses=dict(statuses),
+        latency_ms=_percentiles([r[1] for r in ok]),
+        stages_ms={stage: _percentiles(values) for stage, values in sorted(stages.items())},
+        timeline=timeline,
+    )
+
+def load_corpus(paths, count):
+    """Upload payloads from wav files/directories, or `count` synthetic clips (normal/faulty, some 44.1 kHz stereo)."""
+    files = []
+    for path in paths or []:
+        files.extend(sorted(glob.glob(os.path.join(path, "**", "*.wav"), recursive=True)) if os.path.isdir(path) else [path])
+    if files:
+        corpus = []
+        for path in files:
+            with open(path, "rb") as f:
+                corpus.append((os.path.basename(path), f.read()))
+        return corpus
+
+    corpus = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(count):
+            sample_rate, channels = (44100, 2) if i % 4 == 3 else (config.SAMPLE_RATE, 1)
+            path = write_wav(os.path.join(tmp, f"clip_{i}.wav"), duration=config.DURATION,
+                             sample_rate=sample_rate, channels=channels, fault=i % 2 == 1, seed=i)
+            with open(path, "rb") as f:
+                corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+def print_levels(levels, slo_p99_ms):
+    print("\n" + "="*104)
+    print(f"{'level':>18} {'requests':>9} {'ok req/s':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'cpu %':>6} {'rss MB':>7}  statuses")
+    print("="*104)
+    fmt = lambda v, width=8: f"{v:{width}.1f}" if v is not None else f"{'-':>{width}}"
+    for level in levels:
+        latency, server = level["latency_ms"], level["server"] or {}
+        flag = " 🔴" if not level["meets_slo"] else ""
+        print(f"{level['label']:>18} {level['requests']:>9} {level['ok_per_sec']:>9.1f} {level['error_rate']:>6.1%} "
+              f"{fmt(latency['p50'])} {fmt(latency['p95'])} {fmt(latency['p99'])} "
+              f"{fmt(server.get('cpu_mean_pct'), 6)} {fmt(server.get('rss_max_mb'), 7)}  {level['statuses']}{flag}")
+    print("="*104)
+    stages = sorted({stage for level in levels for stage in level["stages_ms"]})
+    if stages:
+        print(f"{'stage p50/p99 ms':>18} " + " ".join(f"{stage:>15}" for stage in stages))
+        for level in levels:
+            cells = []
+            for stage in stages:
+                p = level["stages_ms"].get(stage)
+                cells.append(f"{p['p50']:>7.1f}/{p['p99']:<7.1f}" if p and p["p50"] is not None else f"{'-':>15}")
+            print(f"{level['label']:>18} " + " ".join(cells))
+        print("="*104)
+    print(f"SLO: p99 <= {slo_p99_ms:.0f} ms and errors < 1%. 🔴 marks levels that miss it.")
+
+def write_html(report, path):
+    """Standalone HTML version of the report: level table, per-stage latency and per-level timelines."""
+    esc = lambda v: html.escape(str(v))
+    fmt = lambda v: f"{v:.1f}" if isinstance(v, (int, float)) else "-"
+    rows = []
+    for level in report["levels"]:
+        server = level["server"] or {}
+        style = "" if level["meets_slo"] else ' class="miss"'
+        rows.append(f"<tr{style}><td>{esc(level['label'])}</td><td>{level['requests']}</td><td>{fmt(level['ok_per_sec'])}</td>"
+                    f"<td>{level['error_rate']:.1%}</td>" + "".join(f"<td>{fmt(level['latency_ms'][p])}</td>" for p in ("p50", "p95", "p99")) +
+                    f"<td>{fmt(server.get('cpu_mean_pct'))}</td><td>{fmt(server.get('rss_max_mb'))}</td><td>{esc(level['statuses'])}</td></tr>")
+    stages = sorted({stage for level in report["levels"] for stage in level["stages_ms"]})
+    stage_rows = [f"<tr><td>{esc(level['label'])}</td>" + "".join(
+        f"<td>{fmt(level['stages_ms'].get(stage, {}).get('p50'))} / {fmt(level['stages_ms'].get(stage, {}).get('p99'))}</td>" for stage in stages) + "</tr>"
+        for level in report["levels"]]
+    timelines = []
+    for level in report["levels"]:
+        timelines.append(f"<h3>{esc(level['label'])}</h3><table><tr><th>t (s)</th><th>offered req/s</th><th>ok req/s</th><th>errors</th><th>p99 ms</th></tr>" +
+                         "".join(f"<tr><td>{b['start_s']:.0f}</td><td>{fmt(b['offered_per_sec'])}</td><td>{fmt(b['ok_per_sec'])}</td>"
+                                 f"<td>{b['error_rate']:.1%}</td><td>{fmt(b['p99_ms'])}</td></tr>" for b in level["timeline"]) + "</table>")
+    sustainable = report["max_sustainable"]
+    document = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Load test {esc(report['timestamp'])}</title>
+<style>body{{font-family:sans-serif;margin:2em}}table{{border-collapse:collapse;margin-bottom:1.5em}}
+td,th{{border:1px solid #ccc;padding:4px 8px;text-align:right}}tr.miss td{{background:#fdd}}</style></head><body>
+<h1>Load test: {esc(report['target'])} ({esc(report['profile'])})</h1>
+<p>{esc(report['timestamp'])} &middot; {esc(report['machine'].get('processor') or report['machine'].get('platform'))} &middot;
+{report['machine'].get('cpu_count')} CPUs &middot; SLO p99 &le; {report['slo_p99_ms']:.0f} ms, errors &lt; 1% &middot;
+highest level meeting it: {esc(sustainable['label'] if sustainable else 'none')}</p>
+<table><tr><th>level</th><th>requests</th><th>ok req/s</th><th>errors</th><th>p50 ms</th><th>p95 ms</th><th>p99 ms</th>
+<th>server cpu %</th><th>server rss MB</th><th>statuses</th></tr>{''.join(rows)}</table>
+<h2>Per-stage latency (p50 / p99 ms)</h2>
+<table><tr><th>level</th>{''.join(f'<th>{esc(s)}</th>' for s in stages)}</tr>{''.join(stage_rows)}</table>
+<h2>Timeline</h2>{''.join(timelines)}
+<h2>Settings</h2><pre>{esc(json.dumps(report['settings'], indent=2))}</pre>
+</body></html>
+"""
+    with open(path, "w") as f:
+        f.write(document)
+
+def compare(current, baseline):
+    """Prints throughput and p99 of each level against the same level in an earlier report."""
+    base_levels = {level["label"]: level for level in baseline["levels"]}
+    print("\n" + "="*78)
+    print(f"{'level':>18} {'ok req/s':>20} {'p99 ms':>24}")
+    print("="*78)
+    for level in current["levels"]:
+        base = base_levels.get(level["label"])
+        if base is None:
+            continue
+        p99, base_p99 = level["latency_ms"]["p99"], base["latency_ms"]["p99"]
+        p99_text = f"{base_p99:.1f} -> {p99:.1f}" if p99 is not None and base_p99 is not None else "-"
+        print(f"{level['label']:>18} {base['ok_per_sec']:>9.1f} -> {level['ok_per_sec']:<7.1f} {p99_text:>24}")
+    print("="*78)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /predict endpoint and report latency against an SLO")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:7860", help="Server base URL")
+    parser.add_argument("--start", action="store_true", help="Launch the --target server on --url's port first")
+    parser.add_argument("--target", type=str, default="server_app", choices=sorted(TARGETS), help="src.server_app or the backend/app.py stub")
+    parser.add_argument("--pid", type=int, default=None, help="Server process to sample CPU/RSS of (automatic with --start)")
+    parser.add_argument("--files", "--file", nargs="+", default=None, help="Wav files or directories to replay (default: synthetic corpus)")
+    parser.add_argument("--corpus", type=int, default=16, help="Synthetic clips when no files are given")
+    parser.add_argument("--profile", type=str, default="closed", choices=PROFILES,
+                        help="closed: fixed client counts; constant/ramp/burst: open-loop Poisson arrivals")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Client counts (closed)")
+    parser.add_argument("--rate", type=float, nargs="+", default=[5, 10, 20], help="Arrival rates in req/s (open loop; ramp start)")
+    parser.add_argument("--rate-end", type=float, default=50, help="Final rate of a ramp")
+    parser.add_argument("--burst-rate", type=float, default=50, help="Rate during bursts")
+    parser.add_argument("--burst-seconds", type=float, default=2, help="Length of each burst")
+    parser.add_argument("--burst-every", type=float, default=10, help="Seconds between burst starts")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per level")
+    parser.add_argument("--max-outstanding", type=int, default=256, help="Open loop: most requests in flight from this client")
+    parser.add_argument("--slo-p99-ms", type=float, default=1000, help="p99 latency objective")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for arrival times")
+    parser.add_argument("--report", type=str, default="loadtest_report.json", help="JSON report path")
+    parser.add_argument("--html", type=str, default="loadtest_report.html", help="HTML report path ('' to skip)")
+    parser.add_argument("--baseline", type=str, default=None, help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.files, args.corpus)
+    uploads = [_multipart(TARGETS[args.target]["field"], name, data) for name, data in corpus]
+    url = args.url.rstrip("/")
+
+    server = start_server(args.target, url) if args.start else None
+    sampler = ProcessSampler(server.pid if server is not None else args.pid).start()
+    levels = []
+    try:
+        if not _wait_ready(url):
+            print("❌ Server did not become ready")
+            sys.exit(1)
+        # Wait for the background model load (503) and warm the decode pool so the first level isn't charged for it
+        deadline = time.time() + 300
+        while _post(url + "/predict", *uploads[0], timeout=120)[0] == 503 and time.time() < deadline:
+            time.sleep(1)
+
+        if args.profile == "closed":
+            plan = [(f"{c} clients", {"concurrency": c}) for c in args.concurrency]
+        elif args.profile == "ramp":
+            plan = [(f"ramp {r:g}-{args.rate_end:g}/s", {"rate": r}) for r in args.rate]
+        elif args.profile == "burst":
+            plan = [(f"{r:g}/s +{args.burst_rate:g}/s bursts", {"rate": r}) for r in args.rate]
+        else:
+            plan = [(f"{r:g}/s", {"rate": r}) for r in args.rate]
+
+        for label, level in plan:
+            print(f"Running {label} for {args.duration:.0f}s...")
+            start = time.perf_counter()
+            if args.profile == "closed":
+                records, wall = run(url + "/predict", uploads, level["concurrency"], args.duration)
+            else:
+                times = arrival_times(args.profile, level["rate"], args.duration, args.rate_end, args.burst_rate,
+                                      args.burst_seconds, args.burst_every, args.seed)
+                records, wall = run_open(url + "/predict", uploads, times, args.max_outstanding)
+            result = summarize(records, wall)
+            p99 = result["latency_ms"]["p99"]
+            result.update(label=label, level=level, server=sampler.summary(start, time.perf_counter()),
+                          meets_slo=p99 is not None and p99 <= args.slo_p99_ms and result["error_rate"] < 0.01)
+            levels.append(result)
+    finally:
+        sampler.stop()
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    passing = [level for level in levels if level["meets_slo"]]
+    best = max(passing, key=lambda level: level["ok_per_sec"]) if passing else None
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_info(),
+        "target": args.target,
+        "profile": args.profile,
+        "slo_p99_ms": args.slo_p99_ms,
+        "corpus": [name for name, _ in corpus],
+        "settings": vars(args),
+        "levels": levels,
+        "max_sustainable": {"label": best["label"], "ok_per_sec": best["ok_per_sec"], "p99_ms": best["latency_ms"]["p99"]} if best else None,
+    }
+    print_levels(levels, args.slo_p99_ms)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
+    if args.html:
+        write_html(report, args.html)
+        print(f"HTML report written to {args.html}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
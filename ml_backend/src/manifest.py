@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import soundfile as sf
+from src import config
+from src.preprocess import label_from_folder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    label INTEGER,
+    machine_id TEXT,
+    duration REAL,
+    sample_rate INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_root ON files (root);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+"""
+
+def _walk_key(row):
+    """Sort key matching find_audio_files' sorted os.walk order: by directory components, then file name."""
+    return (row[0].split(os.sep), row[1])
+
+class DatasetManifest:
+    """
+    SQLite index of every wav under the dataset roots: path, size, mtime, label,
+    machine_id, root, duration and sample rate.
+
+    update() only lists directories whose mtime changed since the last scan (a
+    directory's mtime changes when entries are added, removed or renamed in it);
+    unchanged directories are reused from the index after a single stat. Files
+    rewritten in place keep their directory's mtime, so pass full=True to re-stat
+    every file after such edits.
+
+    Paths are absolute. Labels come from the parent folder (see label_from_folder);
+    wavs in other folders are indexed with label NULL and skipped by entries().
+    """
+    def __init__(self, path=config.MANIFEST_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def update(self, roots, full=False):
+        """Brings the index up to date for roots. Returns counts of listed/skipped dirs and added/changed/removed files."""
+        if isinstance(roots, str):
+            roots = [roots]
+        stats = {"dirs_listed": 0, "dirs_skipped": 0, "added": 0, "changed": 0, "removed": 0}
+        with self.conn:
+            for root in roots:
+                root = os.path.abspath(root)
+                if not os.path.isdir(root):
+                    print(f"⚠️ Dataset root {root} not found, skipping.")
+                    continue
+                self._update_dir(root, root, None, full, stats)
+        return stats
+
+    def _update_dir(self, root, dir_path, parent, full, stats):
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        row = self.conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (dir_path,)).fetchone()
+        if row is not None and row[0] == mtime_ns and not full:
+            # Unchanged listing: trust the indexed files, but subdirectories may still have changed
+            stats["dirs_skipped"] += 1
+            subdirs = [r[0] for r in self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,))]
+            for subdir in subdirs:
+                if os.path.isdir(subdir):
+                    self._update_dir(root, subdir, dir_path, full, stats)
+                else:
+                    self._forget_dir(subdir, stats)
+            return
+
+        stats["dirs_listed"] += 1
+        label = label_from_folder(os.path.basename(dir_path))
+        machine_id = os.path.basename(os.path.dirname(dir_path))
+        known = {r[0]: (r[1], r[2]) for r in self.conn.execute(
+            "SELECT path, size, mtime_ns FROM files WHERE dir = ?", (dir_path,))}
+        known_dirs = {r[0] for r in self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,))}
+        seen, seen_dirs = set(), set()
+
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    seen_dirs.add(entry.path)
+                    self._update_dir(root, entry.path, dir_path, full, stats)
+                elif entry.name.endswith(".wav"):
+                    seen.add(entry.path)
+                    stat = entry.stat()
+                    if known.get(entry.path) == (stat.st_size, stat.st_mtime_ns):
+                        continue
+                    stats["changed" if entry.path in known else "added"] += 1
+                    duration, sample_rate = self._probe(entry.path)
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (entry.path, root, dir_path, entry.name, stat.st_size, stat.st_mtime_ns,
+                         label, machine_id, duration, sample_rate))
+
+        for path in set(known) - seen:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            stats["removed"] += 1
+        for path in known_dirs - seen_dirs:
+            self._forget_dir(path, stats)
+        self.conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)", (dir_path, root, parent, mtime_ns))
+
+    def _forget_dir(self, dir_path, stats):
+        """Drops a vanished directory and everything indexed below it."""
+        for (subdir,) in self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,)).fetchall():
+            self._forget_dir(subdir, stats)
+        stats["removed"] += self.conn.execute("DELETE FROM files WHERE dir = ?", (dir_path,)).rowcount
+        self.conn.execute("DELETE FROM dirs WHERE path = ?", (dir_path,))
+
+    @staticmethod
+    def _probe(path):
+        """(duration, sample_rate) from the wav header, or (None, None) if unreadable."""
+        try:
+            info = sf.info(path)
+            return info.duration, info.samplerate
+        except Exception:
+            return None, None
+
+    def _roots_clause(self, roots):
+        if roots is None:
+            return "", []
+        if isinstance(roots, str):
+            roots = [roots]
+        roots = [os.path.abspath(root) for root in roots]
+        return f" AND root IN ({','.join('?' * len(roots))})", roots
+
+    def entries(self, roots=None):
+        """
+        Labelled files as (file_path, label, machine_id, size, mtime_ns) tuples,
+        per root in the given order and in find_audio_files order within a root.
+        """
+        if isinstance(roots, str):
+            roots = [roots]
+        result = []
+        for root in (roots if roots is not None else [None]):
+            clause, params = self._roots_clause(None if root is None else [root])
+            rows = self.conn.execute(
+                "SELECT dir, name, path, label, machine_id, size, mtime_ns FROM files WHERE label IS NOT NULL" + clause,
+                params).fetchall()
+            rows.sort(key=_walk_key)
+            result.extend(row[2:] for row in rows)
+        return result
+
+    def counts(self, roots=None):
+        """{"labels": {label: n}, "machines": {(machine_id, label): n}, "unlabelled": n} straight from the index."""
+        clause, params = self._roots_clause(roots)
+        labels = dict(self.conn.execute(
+            "SELECT label, COUNT(*) FROM files WHERE label IS NOT NULL" + clause + " GROUP BY label", params))
+        machines = {(machine_id, label): n for machine_id, label, n in self.conn.execute(
+            "SELECT machine_id, label, COUNT(*) FROM files WHERE label IS NOT NULL" + clause +
+            " GROUP BY machine_id, label ORDER BY machine_id, label", params)}
+        unlabelled = self.conn.execute(
+            "SELECT COUNT(*) FROM files WHERE label IS NULL" + clause, params).fetchone()[0]
+        return {"labels": labels, "machines": machines, "unlabelled": unlabelled}
+
+    def audio_stats(self, roots=None):
+        """Sample rate histogram and total/min/max duration of the labelled files."""
+        clause, params = self._roots_clause(roots)
+        rates = dict(self.conn.execute(
+            "SELECT sample_rate, COUNT(*) FROM files WHERE label IS NOT NULL" + clause + " GROUP BY sample_rate", params))
+        total, shortest, longest = self.conn.execute(
+            "SELECT SUM(duration), MIN(duration), MAX(duration) FROM files WHERE label IS NOT NULL" + clause, params).fetchone()
+        return {"sample_rates": rates, "total_duration": total, "min_duration": shortest, "max_duration": longest}
+
+def open_updated(roots, path=config.MANIFEST_PATH, full=False):
+    """Opens the manifest at path, updates it for roots and prints what changed."""
+    manifest = DatasetManifest(path)
+    stats = manifest.update(roots, full=full)
+    print(f"Manifest {path}: listed {stats['dirs_listed']} dirs, reused {stats['dirs_skipped']}; "
+          f"{stats['added']} added, {stats['changed']} changed, {stats['removed']} removed.")
+    return manifest
@@ -0,0 +1,79 @@
+import functools
+import numpy as np
+import scipy.fft
+import scipy.signal
+from numpy.lib.stride_tricks import sliding_window_view
+from src import config
+
+# Max abs difference allowed between MelEngine and the per-clip librosa path
+# (extract_features_librosa), in standardized units. Measured differences are
+# ~1e-6 (float32 FFT round-off); bench_features checks against this bound.
+PARITY_TOLERANCE = 1e-3
+
+@functools.lru_cache(maxsize=None)
+def mel_filterbank(sample_rate, n_fft, n_mels):
+    """Slaney-normalised mel filterbank, (n_mels, 1 + n_fft // 2), same as librosa's default."""
+    import librosa
+    return librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+
+@functools.lru_cache(maxsize=None)
+def hann_window(n_fft):
+    """Periodic Hann window, as used by librosa.stft."""
+    return scipy.signal.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+
+class MelEngine:
+    """
+    Vectorized log-mel front end: (N, samples) waveforms -> (N, n_mels, frames, 1) features.
+
+    Reproduces librosa.feature.melspectrogram (center=True, zero padding, power 2)
+    followed by power_to_db(ref=np.max, top_db=80) and per-clip standardization,
+    but frames, FFTs and projects the whole batch at once with a cached window
+    and filterbank. Work is chunked so peak memory stays near chunk_size clips.
+    """
+    def __init__(self, sample_rate=config.SAMPLE_RATE, n_fft=config.N_FFT, hop_length=config.HOP_LENGTH,
+                 n_mels=config.N_MELS, chunk_size=16, workers=1):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.window = hann_window(n_fft)
+        self.filterbank_t = np.ascontiguousarray(mel_filterbank(sample_rate, n_fft, n_mels).T)
+
+    def num_frames(self, num_samples):
+        return 1 + num_samples // self.hop_length
+
+    def power_mel(self, audio):
+        """(N, samples) -> (N, n_mels, frames) mel power spectrogram."""
+        audio = np.atleast_2d(np.asarray(audio, dtype=np.float32))
+        pad = self.n_fft // 2
+        padded = np.pad(audio, ((0, 0), (pad, pad)))
+        frames = sliding_window_view(padded, self.n_fft, axis=1)[:, ::self.hop_length]
+        spectrum = scipy.fft.rfft(frames * self.window, axis=-1, workers=self.workers)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        return np.matmul(power, self.filterbank_t).transpose(0, 2, 1)
+
+    def to_features(self, mel_power, amin=1e-10, top_db=80.0):
+        """power_to_db(ref=max) + top_db clipping + standardization, per clip."""
+        log_spec = 10.0 * np.log10(np.maximum(amin, mel_power))
+        ref = np.maximum(amin, mel_power.max(axis=(1, 2), keepdims=True))
+        log_spec -= 10.0 * np.log10(ref)
+        log_spec = np.maximum(log_spec, log_spec.max(axis=(1, 2), keepdims=True) - top_db)
+        mean = log_spec.mean(axis=(1, 2), keepdims=True)
+        std = log_spec.std(axis=(1, 2), keepdims=True)
+        features = (log_spec - mean) / (std + 1e-8)
+        return features[..., np.newaxis].astype(np.float32, copy=False)
+
+    def __call__(self, audio):
+        audio = np.atleast_2d(audio)
+        out = np.empty((len(audio), self.n_mels, self.num_frames(audio.shape[1]), 1), dtype=np.float32)
+        for start in range(0, len(audio), self.chunk_size):
+            chunk = audio[start:start + self.chunk_size]
+            out[start:start + len(chunk)] = self.to_features(self.power_mel(chunk))
+        return out
+
+@functools.lru_cache(maxsize=None)
+def get_engine():
+    """Shared MelEngine for the current config (filterbank built once per process)."""
+    return MelEngine()
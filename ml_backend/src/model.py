@@ -2,7 +2,7 @@
 import tensorflow as tf
 from src import config
 
-def create_model(input_shape=config.INPUT_SHAPE):
+def create_model(input_shape=config.INPUT_SHAPE, jit_compile=False, steps_per_execution=1):
     """Creates a deeper CNN model for audio classification."""
     model = tf.keras.models.Sequential([
         # Block 1
@@ -24,14 +24,19 @@ def create_model(input_shape=config.INPUT_SHAPE):
         tf.keras.layers.Dense(64, activation='relu'),
         tf.keras.layers.Dropout(0.3),
         
-        # Output
-        tf.keras.layers.Dense(1, activation='sigmoid')
+        # Output (kept in float32 under mixed precision for a stable sigmoid/loss)
+        tf.keras.layers.Dense(1, activation='sigmoid', dtype='float32')
     ])
     
+    compile_model(model, tf.keras.optimizers.Adam(learning_rate=config.LEARNING_RATE), jit_compile, steps_per_execution)
+    return model
+
+def compile_model(model, optimizer, jit_compile=False, steps_per_execution=1):
+    """(Re)compiles model with the training loss/metrics and the given XLA / steps-per-execution settings."""
     model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=config.LEARNING_RATE),
+        optimizer=optimizer,
         loss='binary_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        jit_compile=jit_compile,
+        steps_per_execution=steps_per_execution
     )
-    
-    return model
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+from src import backends, config
+from src.metrics import REGISTRY
+
+RELOADS = REGISTRY.counter("model_reloads_total", "Model (re)load attempts by result", labelnames=("result",))
+
+def model_version(path):
+    """
+    <file name>@<first 12 hex chars of its sha1>, so identical files get identical versions.
+    For a SavedModel directory the hash covers every file in it (relative path + contents).
+    """
+    digest = hashlib.sha1()
+    if os.path.isdir(path):
+        files = sorted(os.path.join(dirpath, name) for dirpath, _, names in os.walk(path) for name in names)
+    else:
+        files = [path]
+    for file_path in files:
+        if file_path != path:
+            digest.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return f"{os.path.basename(os.path.normpath(path))}@{digest.hexdigest()[:12]}"
+
+class LoadedModel:
+    def __init__(self, backend, path, version):
+        self.backend = backend
+        self.path = path
+        self.version = version
+        self.input_kind = backend.input_kind # "features" or "waveform"
+        self.loaded_at = time.time()
+
+    def predict(self, batch):
+        return self.backend.predict(batch)
+
+class ModelRegistry:
+    """
+    Holds the active model and swaps in new ones without dropping requests.
+
+    load() builds the backend on a background thread, runs warmup predictions at
+    the backend's input shape (so graph tracing / tensor allocation happens before traffic hits
+    it) and only then replaces the active model. Requests already holding the old
+    model finish on it. watch() polls the model file and reloads when it changes.
+
+    run_warmup(fn) runs fn on the thread that will serve predictions and returns
+    its result (e.g. MicroBatcher.call); backends with per-thread state such as
+    TFLite interpreters are only warm on that thread. By default fn runs inline.
+    """
+    def __init__(self, kind=config.INFERENCE_BACKEND, warmup_batch_sizes=(1, config.MAX_BATCH_SIZE), run_warmup=None):
+        self.kind = kind
+        self.warmup_batch_sizes = warmup_batch_sizes
+        self.run_warmup = run_warmup or (lambda fn: fn())
+        self._active = None
+        self._lock = threading.Lock()
+        self._loading = None
+        self._listeners = []
+        self.last_error = None
+
+    @property
+    def active(self):
+        return self._active
+
+    def on_swap(self, callback):
+        """Registers callback(new_model), called after every successful swap."""
+        self._listeners.append(callback)
+
+    def load(self, path, block=False):
+        """Loads path in the background (or inline with block=True). Returns False if a load is already running."""
+        with self._lock:
+            if self._loading is not None:
+                return False
+            self._loading = path
+        if block:
+            self._load(path)
+        else:
+            threading.Thread(target=self._load, args=(path,), name="model-loader", daemon=True).start()
+        return True
+
+    def _load(self, path):
+        try:
+            print(f"Loading {self.kind} model from {path}...")
+            version = model_version(path)
+            loaded = LoadedModel(backends.load_backend(self.kind, path), path, version)
+            self.run_warmup(lambda: self._warmup(loaded))
+            with self._lock:
+                self._active = loaded
+            self.last_error = None
+            RELOADS.inc(result="success")
+            print(f"Model {version} loaded and warmed up.")
+            for callback in self._listeners:
+                callback(loaded)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            RELOADS.inc(result="error")
+            print(f"Error loading model: {e}")
+        finally:
+            with self._lock:
+                self._loading = None
+
+    def _warmup(self, loaded):
+        # TFLite builds an interpreter per batch-size bucket; warm all of them
+        buckets = getattr(loaded.backend, "batch_buckets", ())
+        for batch_size in sorted(set(self.warmup_batch_sizes) | set(buckets)):
+            loaded.predict(np.zeros((batch_size,) + backends.input_shape(self.kind), dtype=np.float32))
+
+    def watch(self, path, interval=config.MODEL_WATCH_INTERVAL):
+        """Polls path every interval seconds and reloads it when its mtime/size changes."""
+        def poll():
+            last = None
+            while True:
+                try:
+                    stat = os.stat(path)
+                    current = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    current = None
+                if last is not None and current is not None and current != last:
+                    print(f"Detected change in {path}, reloading...")
+                    self.load(path)
+                last = current if current is not None else last
+                time.sleep(interval)
+
+        threading.Thread(target=poll, name="model-watcher", daemon=True).start()
+
+    def status(self):
+        active = self._active
+        return {
+            "backend": self.kind,
+            "version": active.version if active else None,
+            "path": active.path if active else None,
+            "loaded_at": active.loaded_at if active else None,
+            "loading": self._loading,
+            "last_error": self.last_error,
+        }
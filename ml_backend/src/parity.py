@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+from src import backends, config, preprocess
+from src.bench_utils import synthetic_audio
+from src.fused_model import MelFrontEnd, build_fused_model
+from src.mel_engine import PARITY_TOLERANCE
+
+SCORE_TOLERANCE = 1e-3 # Max abs score difference between the fused graph and Keras on reference features
+
+def kotlin_features(audio):
+    """
+    NumPy port of android_export/AudioPreprocessor.kt, step for step: 16-bit PCM
+    capture, computeMelSpectrogram (currently a placeholder that copies
+    |audio[j * HOP_LENGTH]| into every mel row) and standardize (population std + 1e-8).
+    """
+    pcm = np.clip(np.round(audio * 32768.0), -32768, 32767) / 32768.0
+    indices = np.arange(config.INPUT_SHAPE[1]) * config.HOP_LENGTH
+    columns = np.where(indices < pcm.shape[1], np.abs(pcm[:, np.minimum(indices, pcm.shape[1] - 1)]), 0.0)
+    spec = np.repeat(columns[:, np.newaxis, :], config.N_MELS, axis=1)
+    mean = spec.mean(axis=(1, 2), keepdims=True)
+    std = np.sqrt(((spec - mean) ** 2).mean(axis=(1, 2), keepdims=True)) + 1e-8
+    return ((spec - mean) / std)[..., np.newaxis].astype(np.float32)
+
+def load_clips(paths, count):
+    """(N, CLIP_SAMPLES) audio from the given files, or count synthetic clips (half with faults)."""
+    if paths:
+        clips = [preprocess.load_audio(path) for path in paths]
+        return np.stack([clip for clip in clips if clip is not None])
+    return np.stack([preprocess.fix_length(synthetic_audio(seed=i, fault=i % 2 == 1)) for i in range(count)])
+
+def feature_errors(features, reference):
+    error = np.abs(features - reference)
+    return float(error.max()), float(error.mean())
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Python, in-graph (fused) and Android preprocessing paths")
+    parser.add_argument("--model", type=str, default=config.MODEL_SAVE_PATH, help="Trained Keras .h5 model")
+    parser.add_argument("--fused", type=str, default=config.FUSED_MODEL_PATH,
+                        help="Exported fused SavedModel (built in memory from --model if missing)")
+    parser.add_argument("--fused-tflite", type=str, default=config.FUSED_TFLITE_PATH, help="Exported fused .tflite (skipped if missing)")
+    parser.add_argument("--clips", type=int, default=16, help="Synthetic clips when no files are given")
+    parser.add_argument("files", nargs='*', help="Wav files to compare on (default: synthetic clips)")
+    args = parser.parse_args()
+
+    audio = load_clips(args.files, args.clips).astype(np.float32)
+    model = tf.keras.models.load_model(args.model)
+
+    reference = preprocess.extract_features_batch(audio)
+    reference_scores = model.predict(reference, verbose=0).reshape(-1)
+    in_graph = MelFrontEnd()(audio).numpy()
+    kotlin = kotlin_features(audio)
+
+    scores = {"keras(in-graph features)": model.predict(in_graph, verbose=0).reshape(-1)}
+    if os.path.isdir(args.fused):
+        scores[f"fused {args.fused}"] = backends.FusedBackend(args.fused).predict(audio).reshape(-1)
+    else:
+        print(f"⚠️ {args.fused} not found, scoring a fused model built in memory (export it with python -m src.fused_model).")
+        scores["fused (in memory)"] = build_fused_model(model).predict(audio, verbose=0).reshape(-1)
+    if os.path.isfile(args.fused_tflite):
+        scores[f"fused {args.fused_tflite}"] = backends.FusedBackend(args.fused_tflite).predict(audio).reshape(-1)
+    kotlin_scores = model.predict(kotlin, verbose=0).reshape(-1)
+
+    print("\n" + "="*78)
+    print(f"{len(audio)} clips; reference = preprocess.extract_features + Keras on {args.model}")
+    print("="*78)
+    print(f"{'features':>28} {'max abs err':>12} {'mean abs err':>13}")
+    in_graph_error = feature_errors(in_graph, reference)
+    print(f"{'in-graph (MelFrontEnd)':>28} {in_graph_error[0]:>12.2e} {in_graph_error[1]:>13.2e}")
+    kotlin_error = feature_errors(kotlin, reference)
+    print(f"{'android (AudioPreprocessor)':>28} {kotlin_error[0]:>12.2e} {kotlin_error[1]:>13.2e}")
+
+    print(f"\n{'scores':>28} {'max abs diff':>12} {'label agree':>13}")
+    score_error = 0.0
+    for name, values in scores.items():
+        diff = float(np.abs(values - reference_scores).max())
+        score_error = max(score_error, diff)
+        agree = np.mean((values > 0.5) == (reference_scores > 0.5)) * 100
+        print(f"{name:>28} {diff:>12.2e} {agree:>12.1f}%")
+    agree = np.mean((kotlin_scores > 0.5) == (reference_scores > 0.5)) * 100
+    print(f"{'android (AudioPreprocessor)':>28} {float(np.abs(kotlin_scores - reference_scores).max()):>12.2e} {agree:>12.1f}%")
+    print("="*78)
+
+    if kotlin_error[0] > PARITY_TOLERANCE:
+        print("⚠️ The Android AudioPreprocessor does not compute log-mel features (placeholder spectrogram);"
+              " ship the fused .tflite to the app so it can feed raw audio instead.")
+    if in_graph_error[0] > PARITY_TOLERANCE or score_error > SCORE_TOLERANCE:
+        print(f"❌ In-graph preprocessing diverges from preprocess.extract_features "
+              f"(tolerances: features {PARITY_TOLERANCE:.0e}, scores {SCORE_TOLERANCE:.0e})")
+        sys.exit(1)
+    print("🟢 In-graph preprocessing matches preprocess.extract_features.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import os
+import time
+import tensorflow as tf
+from src import config
+from src.bench_utils import machine_info
+
+PRECISIONS = ["float32", "mixed_bfloat16", "mixed_float16"]
+
+def configure_threads(intra_op=config.TRAIN_INTRA_OP_THREADS, inter_op=config.TRAIN_INTER_OP_THREADS):
+    """Sets TF's CPU thread pools (0 = TF default). Must run before TensorFlow executes any op."""
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+def cpu_supports_bf16():
+    """True if the CPU has native bfloat16 instructions (AVX512-BF16 or AMX), which is when mixed_bfloat16 pays off."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+def set_precision(precision=config.TRAIN_PRECISION):
+    """
+    Applies a Keras mixed precision policy and returns the one actually used.
+    mixed_bfloat16 falls back to float32 on CPUs without bf16 support, where it is slower.
+    """
+    if precision == "mixed_bfloat16" and not cpu_supports_bf16():
+        print("⚠️ This CPU has no native bfloat16 support, training in float32 instead.")
+        precision = "float32"
+    tf.keras.mixed_precision.set_global_policy(precision)
+    return precision
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """
+    Records training time and samples/sec for every epoch. Only the training batches
+    are timed (epoch start to the last on_train_batch_end), so validation and the
+    epoch-end callbacks such as checkpoint saves don't count; epoch_seconds has the
+    full wall time. Pass samples_per_epoch when the last batch is partial, otherwise
+    steps x batch_size is assumed.
+    """
+    def __init__(self, batch_size=config.BATCH_SIZE, samples_per_epoch=None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.samples_per_epoch = samples_per_epoch
+        self.epochs = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._train_end = self._start
+        self._steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._train_end = time.perf_counter()
+        self._steps = batch + 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = self._train_end - self._start
+        samples = self._steps * self.batch_size
+        if self.samples_per_epoch is not None:
+            samples = min(samples, self.samples_per_epoch)
+        self.epochs.append({
+            "epoch": epoch + 1,
+            "seconds": seconds,
+            "epoch_seconds": time.perf_counter() - self._start,
+            "samples_per_sec": samples / seconds if samples and seconds > 0 else None,
+        })
+
+def write_report(timer, settings, path=config.TRAIN_PERF_REPORT_PATH):
+    """
+    Appends this run (settings + per-epoch times) to the JSON report at path, so runs
+    with different settings on the same dataset can be compared side by side.
+    The first epoch includes graph tracing/XLA compilation and is left out of the steady-state numbers.
+    """
+    steady = timer.epochs[1:] or timer.epochs
+    rates = [e["samples_per_sec"] for e in steady if e["samples_per_sec"]]
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": dict(machine_info(), bf16=cpu_supports_bf16()),
+        "settings": settings,
+        "first_epoch_s": timer.epochs[0]["seconds"] if timer.epochs else None,
+        "mean_epoch_s": sum(e["seconds"] for e in steady) / len(steady) if steady else None,
+        "samples_per_sec": sum(rates) / len(rates) if rates else None,
+        "epochs": timer.epochs,
+    }
+
+    runs = []
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                runs = json.load(f)
+        except (OSError, ValueError):
+            print(f"Could not read {path}, starting a new report.")
+    runs.append(run)
+    with open(path, "w") as f:
+        json.dump(runs, f, indent=2)
+
+    print("\n" + "="*50)
+    print(f"First epoch: {run['first_epoch_s']:.1f}s (includes tracing/compilation)" if run["first_epoch_s"] is not None else "No epochs run.")
+    if run["mean_epoch_s"] is not None:
+        rate = f", {run['samples_per_sec']:.1f} samples/sec" if run["samples_per_sec"] else ""
+        print(f"Steady state: {run['mean_epoch_s']:.1f}s per epoch{rate}")
+    print(f"Performance report appended to {path}")
+    print("="*50)
+    return run
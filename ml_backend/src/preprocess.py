@@ -1,29 +1,87 @@
-
 import librosa
 import numpy as np
 import os
-import tensorflow as tf
-from src import config
+import soundfile as sf
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src import audio_io, config, mel_engine
+
+def fix_length(audio):
+    """
+    Pads (with trailing zeros) or truncates a waveform to exactly CLIP_SAMPLES samples,
+    so extract_features always yields INPUT_SHAPE[1] frames and no resizing is needed.
+    """
+    target_length = config.CLIP_SAMPLES
+    if len(audio) < target_length:
+        audio = np.pad(audio, (0, target_length - len(audio)))
+    else:
+        audio = audio[:target_length]
+    return audio
+
+def read_audio(file_path):
+    """Loads an audio file and resizes/pads it to the fixed duration. Raises on failure."""
+    try:
+        audio = audio_io.read_audio(file_path)
+    except sf.LibsndfileError:
+        # Containers libsndfile can't parse (mp3, m4a, ...) go through librosa/audioread
+        audio, _ = librosa.load(file_path, sr=config.SAMPLE_RATE, duration=config.CLIP_SAMPLES / config.SAMPLE_RATE)
+    
+    # Pad or truncate to ensure consistent length
+    return fix_length(audio)
 
 def load_audio(file_path):
     """Loads an audio file and resizes/pads it to the fixed duration."""
     try:
-        audio, _ = librosa.load(file_path, sr=config.SAMPLE_RATE, duration=config.DURATION)
-        
-        # Pad or truncate to ensure consistent length
-        target_length = int(config.SAMPLE_RATE * config.DURATION)
-        if len(audio) < target_length:
-            audio = np.pad(audio, (0, target_length - len(audio)))
-        else:
-            audio = audio[:target_length]
-            
-        return audio
+        return read_audio(file_path)
     except Exception as e:
         print(f"Error loading {file_path}: {e}")
         return None
 
+def load_audio_bytes(data):
+    """Like load_audio, but decodes an in-memory file (e.g. an HTTP upload) without touching disk."""
+    try:
+        return fix_length(audio_io.decode_audio_bytes(data))
+    except Exception as e:
+        print(f"Error decoding uploaded audio: {e}")
+        return None
+
+def featurize_upload(data, waveform=False):
+    """
+    Decodes and featurizes one uploaded file, returning ((1,) + INPUT_SHAPE features, info).
+    With waveform=True (models with in-graph preprocessing) it returns the (1, CLIP_SAMPLES)
+    clip instead. info has the header duration and per-stage timings (seconds). Top-level so
+    the server can run it in a process pool. Raises ValueError if the audio can't be decoded.
+    """
+    timings = {}
+    start = time.perf_counter()
+    duration = audio_io.probe_duration(data)
+    audio = load_audio_bytes(data)
+    timings["decode"] = time.perf_counter() - start
+    if audio is None:
+        raise ValueError("Could not load audio")
+    if waveform:
+        return fix_length(audio)[np.newaxis], {"duration": duration, "timings": timings}
+
+    start = time.perf_counter()
+    features = extract_features(audio)[np.newaxis] # Add batch dimension
+    timings["features"] = time.perf_counter() - start
+    return features, {"duration": duration, "timings": timings}
+
+def warmup():
+    """Runs featurization once on silence (filterbank construction, lazy imports). Used to prime worker processes."""
+    extract_features(np.zeros(config.CLIP_SAMPLES, dtype=np.float32))
+    return os.getpid()
+
 def extract_features(audio):
     """Converts audio waveform to Mel Spectrogram."""
+    return mel_engine.get_engine()(audio[np.newaxis])[0]
+
+def extract_features_batch(audio_batch):
+    """Converts an (N, samples) batch of waveforms to (N, N_MELS, frames, 1) Mel Spectrograms."""
+    return mel_engine.get_engine()(audio_batch)
+
+def extract_features_librosa(audio):
+    """Reference per-clip librosa implementation that MelEngine is checked against."""
     mel_spec = librosa.feature.melspectrogram(
         y=audio, 
         sr=config.SAMPLE_RATE, 
@@ -40,53 +98,154 @@ def extract_features(audio):
     mel_spec_db = mel_spec_db[..., np.newaxis]
     return mel_spec_db
 
-def preprocess_dataset(dataset_path):
+def label_from_folder(folder_name):
+    """Maps a parent folder name to a label: normal -> 0, abnormal/fault -> 1, otherwise None."""
+    folder_name = folder_name.lower()
+    if folder_name == "normal":
+        return 0
+    elif folder_name == "abnormal" or "fault" in folder_name:
+        return 1
+    return None
+
+def find_audio_files(dataset_path):
+    """
+    Scans the dataset directory for 'normal' and 'abnormal' folders recursively.
+    Returns a list of (file_path, label, machine_id) tuples in a deterministic
+    (sorted) order, so serial and parallel extraction line up sample for sample.
+    """
+    entries = []
+    for root, dirs, files in os.walk(dataset_path):
+        dirs.sort()
+        
+        # Determine label from parent folder name
+        label = label_from_folder(os.path.basename(root))
+        if label is None:
+            continue
+        
+        # Determine Machine ID (Grandparent folder)
+        # ex: dataset/valve/id_00/normal -> id_00
+        machine_id = os.path.basename(os.path.dirname(root))
+        
+        for file in sorted(files):
+            if file.endswith(".wav"):
+                entries.append((os.path.join(root, file), label, machine_id))
+    return entries
+
+def _features_for_file(file_path):
+    """Worker task: decode + featurize one file. Returns (features, error)."""
+    try:
+        audio = read_audio(file_path)
+        return extract_features(audio), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _features_for_files(file_paths):
+    """Worker task: decode a chunk of files and featurize them as one batch. Returns [(features, error)]."""
+    audios = []
+    errors = []
+    for file_path in file_paths:
+        try:
+            audios.append(read_audio(file_path))
+            errors.append(None)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+    
+    batch = iter(extract_features_batch(np.stack(audios)) if audios else [])
+    return [(next(batch), None) if error is None else (None, error) for error in errors]
+
+def iter_features(file_paths, num_workers=None, cache=None):
+    """
+    Extracts features for file_paths, yielding (file_path, features, error) in input order.
+    Exactly one of features/error is None. num_workers=1 runs in-process;
+    anything larger fans the files out over a process pool. With a FeatureCache,
+    cached files are read back without decoding and fresh results are stored.
+    """
+    if num_workers is None:
+        num_workers = config.NUM_WORKERS
+    
+    cached = set()
+    if cache is not None:
+        cached = {file_path for file_path in file_paths if cache.contains(file_path)}
+    missing = [file_path for file_path in file_paths if file_path not in cached]
+    extracted = _extract_files(missing, num_workers)
+    
+    for file_path in file_paths:
+        if file_path in cached:
+            features = cache.get(file_path)
+            if features is not None:
+                yield file_path, features, None
+                continue
+            # Evicted since the lookup: fall back to extracting it here
+            features, error = _features_for_file(file_path)
+        else:
+            _, features, error = next(extracted)
+        if error is None and cache is not None:
+            cache.put(file_path, features)
+        yield file_path, features, error
+
+def _extract_files(file_paths, num_workers):
+    """
+    Yields (file_path, features, error) for file_paths in order, serially or over a process pool.
+    Files are handled in chunks of FEATURE_BATCH_SIZE so each chunk goes through MelEngine as one batch.
+    """
+    batch_size = config.FEATURE_BATCH_SIZE
+    chunks = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+    num_workers = max(1, min(num_workers, len(chunks)))
+    
+    if num_workers == 1:
+        results = map(_features_for_files, chunks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=num_workers)
+        results = executor.map(_features_for_files, chunks)
+    
+    try:
+        for chunk, chunk_results in zip(chunks, results):
+            for file_path, (features, error) in zip(chunk, chunk_results):
+                yield file_path, features, error
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def preprocess_dataset(dataset_path, num_workers=None, cache=None, manifest=None, failures=None):
     """
     Scans the dataset directory for 'normal' and 'abnormal' folders recursively.
     Returns X (features) and y (labels).
     Label mapping: normal -> 0, abnormal -> 1
+    With an up-to-date DatasetManifest, files are listed from it instead of walking the tree.
+    Pass a list as failures to get (file_path, error) for every file that was skipped.
     """
     X = []
     y = []
     groups = [] # To store machine IDs
+    if failures is None:
+        failures = []
+    skipped_before = len(failures)
     
-    # ... (existing setup)
+    if manifest is not None:
+        entries = [entry[:3] for entry in manifest.entries(dataset_path)]
+    else:
+        entries = find_audio_files(dataset_path)
+    file_paths = [entry[0] for entry in entries]
     
-    for root, dirs, files in os.walk(dataset_path):
-        for file in files:
-            # ... (counter logic)
-            if file.endswith(".wav"):
-                file_path = os.path.join(root, file)
-                
-                # Determine label from parent folder name
-                parent_folder = os.path.basename(root).lower()
-                
-                # Determine Machine ID (Grandparent folder)
-                # ex: dataset/valve/id_00/normal -> id_00
-                machine_id = os.path.basename(os.path.dirname(root))
-                
-                if parent_folder == "normal":
-                    label = 0
-                elif parent_folder == "abnormal" or "fault" in parent_folder:
-                    label = 1
-                else:
-                    continue 
-                
-                audio = load_audio(file_path)
-                if audio is not None:
-                    features = extract_features(audio)
-                    # ... (resize logic)
-                    if features.shape[1] != config.INPUT_SHAPE[1]:
-                         features = tf.image.resize(features, (config.INPUT_SHAPE[0], config.INPUT_SHAPE[1])).numpy()
-                    
-                    X.append(features)
-                    y.append(label)
-                    groups.append(machine_id)
+    for (file_path, label, machine_id), (_, features, error) in zip(entries, iter_features(file_paths, num_workers, cache)):
+        if error is not None:
+            print(f"Error processing {file_path}: {error}")
+            failures.append((file_path, error))
+            continue
+        
+        X.append(features)
+        y.append(label)
+        groups.append(machine_id)
                     
     X = np.array(X)
     y = np.array(y)
     groups = np.array(groups)
     
     print(f"Processed {len(X)} samples.")
+    if cache is not None:
+        print(f"Feature cache: {cache.hits} hits, {cache.misses} misses.")
+    if len(failures) > skipped_before:
+        print(f"Failed to process {len(failures) - skipped_before} of {len(entries)} files.")
     print(f"Machine IDs found: {np.unique(groups)}")
     return X, y, groups
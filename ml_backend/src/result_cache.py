@@ -0,0 +1,169 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from src import config
+from src.metrics import REGISTRY
+
+LOOKUPS = REGISTRY.counter("predict_result_cache_total", "Prediction result cache lookups by result", labelnames=("result",))
+WRITE_ERRORS = REGISTRY.counter("predict_result_cache_write_errors_total", "Results that could not be stored in the cache")
+STALE_TMP_SECONDS = 60 # Temp files older than this are leftovers of crashed writers, not writes in progress
+
+class MemoryStore:
+    """In-process LRU of key -> (stored_at, value), bounded by entry count and age."""
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class DirectoryStore:
+    """
+    Store shared by every server process on the host: one small JSON file per key
+    under store_dir (ideally on tmpfs, e.g. /dev/shm). Writes are atomic renames;
+    age comes from the file mtime. Every 100 writes, expired files and the least
+    recently read ones beyond max_entries are removed.
+    """
+    def __init__(self, store_dir, max_entries, ttl):
+        self.store_dir = store_dir
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._puts = 0
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.store_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - os.stat(path).st_mtime > self.ttl:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                value = json.load(f)
+            os.utime(path, (time.time(), os.stat(path).st_mtime)) # atime marks recency, mtime keeps the age
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        tmp_path = os.path.join(self.store_dir, f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, self._path(key))
+        self._puts += 1
+        if self._puts % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then the least recently read ones beyond max_entries."""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.store_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.store_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if self.ttl and now - stat.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                entries.append((stat.st_atime, path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            self._remove(path)
+
+    def clear(self):
+        """Removes every cache entry and stale temp files; other files and writes in progress are left alone."""
+        now = time.time()
+        for name in os.listdir(self.store_dir):
+            path = os.path.join(self.store_dir, name)
+            if name.endswith(".json"):
+                self._remove(path)
+            elif name.startswith(".") and name.endswith(".tmp"):
+                try:
+                    if now - os.stat(path).st_mtime > STALE_TMP_SECONDS:
+                        self._remove(path)
+                except OSError:
+                    pass
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.store_dir) if name.endswith(".json"))
+
+class ResultCache:
+    """
+    Prediction results keyed by sha256(upload bytes) + model version, so re-submitted
+    clips skip decode/features/predict. A new model version never matches old keys;
+    invalidate() (hooked to ModelRegistry.on_swap) also frees the stale entries.
+    """
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def key(data, model_version):
+        digest = hashlib.sha256(data)
+        digest.update(model_version.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, data, model_version):
+        value = self.store.get(self.key(data, model_version))
+        LOOKUPS.inc(result="miss" if value is None else "hit")
+        return value
+
+    def put(self, data, model_version, result):
+        """Stores result; a failed write is logged and counted, never raised, since the caller already has its answer."""
+        try:
+            self.store.put(self.key(data, model_version), result)
+        except Exception as e:
+            WRITE_ERRORS.inc()
+            print(f"⚠️ Could not store result in cache: {type(e).__name__}: {e}")
+
+    def invalidate(self, *_):
+        self.store.clear()
+
+def from_config():
+    """ResultCache configured by RESULT_CACHE_* settings, or None when disabled."""
+    if config.RESULT_CACHE_SIZE <= 0:
+        return None
+    if config.RESULT_CACHE_DIR:
+        store = DirectoryStore(config.RESULT_CACHE_DIR, config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+    else:
+        store = MemoryStore(config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+    return ResultCache(store)
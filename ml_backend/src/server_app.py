@@ -1,19 +1,26 @@
 
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import tensorflow as tf
-from flask import Flask, request, jsonify
-from src import config, preprocess
-import tempfile
-import uuid
+from flask import Flask, Response, g, request, jsonify
+from src import backends, config, preprocess, result_cache, streaming
+from src.batching import InflightLimiter, MicroBatcher
+from src.mel_engine import get_engine
+from src.metrics import REGISTRY, StageTimer
+from src.model_registry import ModelRegistry
 
 app = Flask(__name__)
+# Reject oversized request bodies before they are buffered (handled by too_large below)
+app.config['MAX_CONTENT_LENGTH'] = config.MAX_LONG_UPLOAD_BYTES + 64 * 1024 # Headroom for multipart framing
 
 # Load Model
-MODEL_PATH = config.MODEL_SAVE_PATH
+BACKEND = config.INFERENCE_BACKEND
+MODEL_PATH = backends.default_model_path(BACKEND)
 # Fallback if model in config doesn't exist but local checks do
 # Fallback if model in config doesn't exist but local checks do
-if not os.path.exists(MODEL_PATH):
+if BACKEND == "keras" and not os.path.exists(MODEL_PATH):
     if os.path.exists("model.h5"):
         MODEL_PATH = "model.h5"
     elif os.path.exists("final_model.h5"):
@@ -22,14 +29,68 @@ if not os.path.exists(MODEL_PATH):
         MODEL_PATH = "finalminorproject/final_model.h5"
     elif os.path.exists("finalminorproject/model.h5"):
         MODEL_PATH = "finalminorproject/model.h5"
+elif BACKEND == "tflite" and not os.path.exists(MODEL_PATH):
+    if os.path.exists("finalminorproject/" + MODEL_PATH):
+        MODEL_PATH = "finalminorproject/" + MODEL_PATH
 
-print(f"Loading model from {MODEL_PATH}...")
-try:
-    model = tf.keras.models.load_model(MODEL_PATH)
-    print("Model loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+# Fused models take the decoded clip and compute the mel features in their own graph
+RAW_AUDIO = backends.BACKENDS[BACKEND].input_kind == "waveform"
+
+def _predict_with_active_model(batch):
+    """Runs one batch on whichever model is active and tags each row with its version."""
+    loaded = registry.active
+    return [(row, loaded.version) for row in loaded.predict(batch)]
+
+# Concurrent requests share model calls through the micro-batcher
+batcher = MicroBatcher(_predict_with_active_model)
+
+# Loaded in the background and warmed up on the batcher thread (which runs every prediction); swapped atomically on reload
+registry = ModelRegistry(BACKEND, run_warmup=lambda fn: batcher.call(fn).result())
+registry.load(MODEL_PATH)
+if config.MODEL_WATCH_INTERVAL > 0:
+    registry.watch(MODEL_PATH)
+
+# Decode/featurize uploads in worker processes (DECODE_WORKERS=0 keeps it in the request thread)
+DECODE_POOL = None
+if config.DECODE_WORKERS > 0:
+    DECODE_POOL = ProcessPoolExecutor(config.DECODE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    for _ in range(config.DECODE_WORKERS):
+        DECODE_POOL.submit(preprocess.warmup)
+
+# Requests allowed in flight at once (per process); the rest get HTTP 429
+INFLIGHT = InflightLimiter(config.MAX_INFLIGHT)
+
+# Results for re-submitted uploads (RESULT_CACHE_SIZE=0 disables it); dropped whenever the model changes
+RESULT_CACHE = result_cache.from_config()
+if RESULT_CACHE is not None:
+    registry.on_swap(RESULT_CACHE.invalidate)
+
+# =======================================================
+# METRICS (exposed at /metrics in Prometheus text format)
+# =======================================================
+REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "End-to-end request latency", labelnames=("endpoint", "status"))
+STAGE_SECONDS = REGISTRY.histogram("predict_stage_seconds", "Latency of each step of a prediction", labelnames=("stage",))
+REQUEST_BYTES = REGISTRY.histogram("predict_upload_bytes", "Size of uploaded audio files",
+                                   buckets=(16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 5e6, 10e6, 50e6))
+AUDIO_SECONDS = REGISTRY.histogram("predict_audio_duration_seconds", "Duration of uploaded audio (from the file header)",
+                                   buckets=(0.5, 1, 2, 3, 4, 5, 6, 10, 30, 60, 300, 600))
+ERRORS = REGISTRY.counter("predict_errors_total", "Failed predictions by reason", labelnames=("reason",))
+REGISTRY.gauge("predict_queue_depth", "Requests waiting in the micro-batcher", lambda: batcher.queue_depth())
+REGISTRY.gauge("predict_inflight", "Prediction requests currently being handled", lambda: INFLIGHT.count)
+
+def _error(message, status, reason):
+    ERRORS.inc(reason=reason)
+    return jsonify({"error": message}), status
+
+def _overloaded(message="Server busy, retry shortly"):
+    response, status = _error(message, 429, "overloaded")
+    response.headers["Retry-After"] = "1"
+    return response, status
+
+def _model_unavailable():
+    if registry.status()["loading"]:
+        return _error("Model is loading, retry shortly", 503, "no_model")
+    return _error("Model not loaded", 500, "no_model")
 
 # =======================================================
 # NEW: In-App Update API
@@ -55,41 +116,100 @@ def get_version():
         "force_update": False
     })
 
+@app.route('/api/batching', methods=['GET'])
+def batching_stats():
+    """Micro-batcher metrics: batch size distribution and queue wait."""
+    return jsonify(batcher.stats())
+
+# =======================================================
+# MODEL ADMIN
+# =======================================================
+def _admin_authorized():
+    return config.ADMIN_TOKEN is not None and request.headers.get("X-Admin-Token") == config.ADMIN_TOKEN
+
+@app.route('/admin/model', methods=['GET'])
+def model_status():
+    """Active model version and reload state."""
+    return jsonify(registry.status())
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """
+    Loads a model in the background and swaps it in once warmed up.
+    JSON body {"path": "..."} picks another file; default is the current one.
+    Requires the X-Admin-Token header to match ADMIN_TOKEN.
+    """
+    if not _admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    body = request.get_json(silent=True) or {}
+    path = body.get("path") or (registry.active.path if registry.active else MODEL_PATH)
+    if not os.path.exists(path):
+        return jsonify({"error": f"Model file not found: {path}"}), 400
+    if not registry.load(path):
+        return jsonify({"error": "A reload is already in progress"}), 409
+    return jsonify({"status": "loading", "path": path}), 202
+
 # =======================================================
 # SHARED LOGIC
 # =======================================================
 def run_prediction_logic():
-    if model is None:
-        return jsonify({"error": "Model not loaded"}), 500
+    if registry.active is None:
+        return _model_unavailable()
 
+    # Backpressure: shed load instead of queueing without bound
+    if not INFLIGHT.try_acquire():
+        return _overloaded()
+    try:
+        return _predict_upload()
+    finally:
+        INFLIGHT.release()
+
+def _predict_upload():
     if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
+        return _error("No file part", 400, "bad_request")
     
     file = request.files['file']
     if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
+        return _error("No selected file", 400, "bad_request")
 
-    # Use System Temp Dir (Compatible with Cloud & Local)
-    temp_path = os.path.join(tempfile.gettempdir(), f"temp_{uuid.uuid4()}.wav")
-    
+    timer = StageTimer(STAGE_SECONDS)
     try:
-        file.save(temp_path)
-        
-        # Preprocess
-        audio = preprocess.load_audio(temp_path)
-        if audio is None:
-             return jsonify({"error": "Could not load audio"}), 400
-
-        features = preprocess.extract_features(audio)
-        features = np.expand_dims(features, axis=0) # Add batch dimension
+        # Decode straight from the upload buffer (no temp file round trip)
+        with timer.stage("read"):
+            data = file.read(config.MAX_UPLOAD_BYTES + 1)
+        if len(data) > config.MAX_UPLOAD_BYTES:
+            return _error(f"File too large (max {config.MAX_UPLOAD_BYTES} bytes)", 413, "too_large")
+        REQUEST_BYTES.observe(len(data))
 
-        # Resize if needed (Matching inference.py logic)
-        if features.shape[1:3] != config.INPUT_SHAPE[0:2]:
-            features = tf.image.resize(features, (config.INPUT_SHAPE[0], config.INPUT_SHAPE[1])).numpy()
+        # Same bytes + same model -> same answer
+        if RESULT_CACHE is not None:
+            cached = RESULT_CACHE.get(data, registry.active.version)
+            if cached is not None:
+                return jsonify(dict(cached, cached=True))
+        
+        # Preprocess (in the decode pool when enabled, so CPU-bound work runs outside this process's GIL)
+        try:
+            if DECODE_POOL is not None:
+                start = time.perf_counter()
+                features, info = DECODE_POOL.submit(preprocess.featurize_upload, data, RAW_AUDIO).result()
+                timer.record("pool", time.perf_counter() - start - sum(info["timings"].values()))
+            else:
+                features, info = preprocess.featurize_upload(data, RAW_AUDIO)
+        except ValueError as e:
+            return _error(str(e), 400, "decode")
+        for stage, seconds in info["timings"].items():
+            timer.record(stage, seconds)
+        if info["duration"] is not None:
+            AUDIO_SECONDS.observe(info["duration"])
 
-        # Predict
-        prediction = model.predict(features, verbose=0)
-        score = float(prediction[0][0]) # Convert to float for JSON serialization logic
+        # Predict (batched with any other in-flight requests)
+        start = time.perf_counter()
+        future = batcher.submit(features)
+        prediction, version = future.result()
+        queue_seconds = getattr(future, "queue_seconds", 0.0)
+        timer.record("queue", queue_seconds)
+        timer.record("predict", time.perf_counter() - start - queue_seconds)
+        score = float(prediction[0]) # Convert to float for JSON serialization logic
 
         if score > 0.5:
             confidence = score * 100
@@ -104,35 +224,226 @@ def run_prediction_logic():
             "label": label,
             "confidence": confidence,
             "score": score,
-            "is_fault": is_fault
+            "is_fault": is_fault,
+            "model_version": version
         }
+        if RESULT_CACHE is not None:
+            RESULT_CACHE.put(data, version, dict(result)) # Copy: timing below is per request, not cached
+        
+        # Per-request stage breakdown, on demand
+        if request.headers.get("X-Timing", "").lower() in ("1", "true", "yes"):
+            result["timing"] = dict(timer.timings, batch_size=getattr(future, "batch_size", 1))
         
         return jsonify(result)
 
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
-    finally:
-        # Safe delete attempt
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except Exception as e:
-                print(f"Warning: Could not remove temp file {temp_path}: {e}")
+        return _error(str(e), 500, "internal")
 
 # =======================================================
 # ROUTES
 # =======================================================
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    if request.endpoint not in (None, 'metrics'):
+        elapsed = time.perf_counter() - g.get("request_start", time.perf_counter())
+        REQUEST_SECONDS.observe(elapsed, endpoint=request.endpoint, status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+def _upload_limit():
+    """Only /predict/windows and stream chunks accept long recordings; everything else gets the clip-sized limit."""
+    return config.MAX_LONG_UPLOAD_BYTES if request.endpoint in ('predict_windows_endpoint', 'push_stream') else config.MAX_UPLOAD_BYTES
+
+@app.before_request
+def check_upload_size():
+    limit = _upload_limit()
+    if request.content_length is not None and request.content_length > limit + 64 * 1024:
+        return jsonify({"error": f"File too large (max {limit} bytes)"}), 413
+
+@app.errorhandler(413)
+def too_large(e):
+    # Raised by Flask for bodies without a Content-Length that run past MAX_CONTENT_LENGTH
+    return jsonify({"error": f"File too large (max {_upload_limit()} bytes)"}), 413
+
 @app.route('/predict', methods=['POST'])
 def predict_endpoint():
-    print("DEBUG: /predict Handling Request")
     return run_prediction_logic()
 
+@app.route('/predict/windows', methods=['POST'])
+def predict_windows_endpoint():
+    """
+    Scores a whole recording in overlapping DURATION-second windows.
+    Optional form field 'hop' sets the seconds between windows.
+    """
+    loaded = registry.active
+    if loaded is None:
+        return _model_unavailable()
+    if loaded.input_kind != "features":
+        return _error("/predict/windows needs a keras or tflite backend (windows are scored on streamed mel features)", 400, "bad_request")
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({"error": "No file part"}), 400
+
+    try:
+        hop = float(request.form.get('hop', config.WINDOW_HOP_SECONDS))
+    except ValueError:
+        return jsonify({"error": "Invalid hop"}), 400
+    if hop <= 0:
+        return jsonify({"error": "Invalid hop"}), 400
+
+    if not INFLIGHT.try_acquire():
+        return _overloaded()
+    try:
+        # Decoded block by block from the upload stream, so memory doesn't grow with file length
+        result = streaming.score_windows(streaming.iter_audio_blocks(request.files['file'].stream), loaded, hop)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Could not score audio: {e}"}), 400
+    finally:
+        INFLIGHT.release()
+
+    result["is_fault"] = result["max"] > 0.5
+    result["label"] = "FAULT DETECTED" if result["is_fault"] else "NORMAL"
+    result["model_version"] = loaded.version
+    return jsonify(result)
+
+# =======================================================
+# STREAMING: raw PCM pushed in chunks, scored every interval
+# =======================================================
+STREAMS = streaming.StreamManager()
+STREAM_READ_BYTES = 64 * 1024 # Request body is consumed in pieces this size, so chunked uploads are processed as they arrive
+STREAM_WINDOWS = REGISTRY.counter("stream_windows_total", "Windows scored on /stream sessions")
+REGISTRY.gauge("stream_active", "Open /stream sessions", lambda: len(STREAMS))
+REGISTRY.gauge("stream_evicted", "Streams dropped after STREAM_IDLE_TIMEOUT without audio", lambda: STREAMS.evicted)
+
+@app.route('/stream', methods=['POST'])
+def open_stream():
+    """
+    Opens a stream. Optional JSON/form/query fields: sample_rate (default SAMPLE_RATE),
+    channels (1), format ('s16le' or 'f32le') and interval (seconds between scores).
+    """
+    loaded = registry.active
+    if loaded is None:
+        return _model_unavailable()
+    if loaded.input_kind != "features":
+        return _error("/stream needs a keras or tflite backend (scores are computed on streamed mel features)", 400, "bad_request")
+    params = dict(request.values.items(), **(request.get_json(silent=True) or {}))
+    try:
+        session = STREAMS.open(
+            sample_rate=int(params.get("sample_rate", config.SAMPLE_RATE)),
+            channels=int(params.get("channels", 1)),
+            sample_format=params.get("format", "s16le"),
+            interval_seconds=float(params.get("interval", config.STREAM_INTERVAL_SECONDS)),
+        )
+    except ValueError as e:
+        return _error(str(e), 400, "bad_request")
+    if session is None:
+        return _overloaded(f"Too many open streams (max {config.MAX_STREAMS})")
+    return jsonify({
+        "stream_id": session.stream_id,
+        "interval": session.interval_seconds,
+        "window_seconds": config.INPUT_SHAPE[1] * config.HOP_LENGTH / config.SAMPLE_RATE,
+        "idle_timeout": config.STREAM_IDLE_TIMEOUT,
+    }), 201
+
+@app.route('/stream/<stream_id>', methods=['POST'])
+def push_stream(stream_id):
+    """
+    Appends raw interleaved PCM (request body, may be sent with chunked transfer encoding)
+    and returns a score for every window completed by it.
+    """
+    session = STREAMS.get(stream_id)
+    if session is None:
+        return _error("Unknown or expired stream", 404, "bad_request")
+    error = _check_stream_model()
+    if error is not None:
+        return error
+    if not INFLIGHT.try_acquire():
+        return _overloaded()
+
+    scores = []
+    try:
+        with session.lock:
+            # Score as the body arrives rather than after the whole (possibly chunked) upload
+            while True:
+                data = request.stream.read(STREAM_READ_BYTES)
+                if not data:
+                    break
+                scores.extend(_score_stream_windows(session, session.push(data)))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return _error(str(e), 500, "internal")
+    finally:
+        INFLIGHT.release()
+    return jsonify({"stream_id": stream_id, "received_seconds": session.seconds_received, "scores": scores})
+
+@app.route('/stream/<stream_id>', methods=['DELETE'])
+def close_stream(stream_id):
+    """Ends a stream, scoring its tail (short streams are padded like /predict), and returns a summary."""
+    # Busy: refuse before closing, so the client can retry the DELETE
+    if not INFLIGHT.try_acquire():
+        return _overloaded()
+    try:
+        session = STREAMS.close(stream_id)
+        if session is None:
+            return _error("Unknown or expired stream", 404, "bad_request")
+        scores = []
+        loaded = registry.active
+        if loaded is not None and loaded.input_kind == "features":
+            with session.lock:
+                scores = _score_stream_windows(session, session.flush())
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return _error(str(e), 500, "internal")
+    finally:
+        INFLIGHT.release()
+    return jsonify({
+        "stream_id": stream_id,
+        "received_seconds": session.seconds_received,
+        "scores": scores,
+        "windows": session.windows_emitted,
+        "max_score": session.max_score,
+    })
+
+def _check_stream_model():
+    """Error response unless the active model scores mel features (it may have been reloaded since the stream opened)."""
+    loaded = registry.active
+    if loaded is None:
+        return _model_unavailable()
+    if loaded.input_kind != "features":
+        return _error("The active model takes raw audio; /stream needs a keras or tflite backend", 409, "bad_request")
+    return None
+
+def _score_stream_windows(session, windows):
+    """Scores (start_seconds, mel window) pairs; each window is its own micro-batcher request, so windows batch across streams."""
+    if not windows:
+        return []
+    features = get_engine().to_features(np.stack([window for _, window in windows]).transpose(0, 2, 1))
+    futures = [batcher.submit(features[i:i + 1]) for i in range(len(windows))]
+    scores = []
+    for (start, _), future in zip(windows, futures):
+        prediction, version = future.result()
+        score = float(prediction[0])
+        session.max_score = score if session.max_score is None else max(session.max_score, score)
+        scores.append({"start": round(start, 3), "score": score, "is_fault": score > 0.5, "model_version": version})
+    STREAM_WINDOWS.inc(len(windows))
+    return scores
+
 @app.route('/', methods=['GET', 'POST'])
 def root():
-    print(f"DEBUG: Root Route Request. Method: {request.method}")
     if request.method == 'POST':
         # If the App sends data to the root URL, handle it as a prediction!
         return run_prediction_logic()
@@ -166,4 +477,5 @@ if __name__ == '__main__':
         print("Could not start public tunnel. You will need to use Local IP.")
 
     # Host 0.0.0.0 allows access from external IPs (like Android on same WiFi)
-    app.run(host='0.0.0.0', port=5000)
+    # threaded=True lets uploads, decoding and model calls of different requests overlap
+    app.run(host='0.0.0.0', port=5000, threaded=True)
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+import soundfile as sf
+from src import config
+from src.bench_utils import write_wav
+
+def _request(url, method="POST", body=None, content_type="application/octet-stream", timeout=30):
+    req = urllib.request.Request(url, data=body, method=method, headers={"Content-Type": content_type})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+def _collect(path, new_scores, scores, verbose):
+    for score in new_scores:
+        scores.append(score)
+        if verbose:
+            marker = "🔴" if score["is_fault"] else "🟢"
+            print(f"  {os.path.basename(path)} {score['start']:>8.2f}s  {marker} {score['score']:.3f}")
+
+def replay(base_url, path, speed=1.0, chunk_seconds=0.5, interval=None, verbose=False):
+    """
+    Streams one wav file to the server as 16-bit PCM at its native rate and channel count,
+    chunk_seconds at a time, paced at `speed` x real time (0 = as fast as possible).
+    Returns the close summary plus per-chunk latencies and every score received.
+    """
+    with sf.SoundFile(path) as f:
+        params = {"sample_rate": f.samplerate, "channels": f.channels, "format": "s16le"}
+        if interval:
+            params["interval"] = interval
+        stream = _request(base_url + "/stream", body=json.dumps(params).encode(), content_type="application/json")
+        stream_url = f"{base_url}/stream/{stream['stream_id']}"
+
+        latencies, scores = [], []
+        start = time.perf_counter()
+        sent_seconds = 0.0
+        for block in f.blocks(blocksize=max(1, int(f.samplerate * chunk_seconds)), dtype="int16", always_2d=True):
+            if speed > 0:
+                # Don't send audio before it would have been recorded
+                time.sleep(max(0.0, start + sent_seconds / speed - time.perf_counter()))
+            t = time.perf_counter()
+            result = _request(stream_url, body=block.tobytes())
+            latencies.append((time.perf_counter() - t) * 1000)
+            sent_seconds += len(block) / f.samplerate
+            _collect(path, result["scores"], scores, verbose)
+        wall = time.perf_counter() - start
+
+    summary = _request(stream_url, method="DELETE") # Also scores the tail of the stream
+    _collect(path, summary.pop("scores"), scores, verbose)
+    summary.update(path=path, wall_seconds=wall, latencies=latencies, scores=scores)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay wav files into the /stream endpoint as live audio")
+    parser.add_argument("files", nargs='*', help="Wav files to stream, one concurrent stream each (default: a synthetic 30 s clip)")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:7860", help="Server base URL")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed (1 = real time, 0 = as fast as possible)")
+    parser.add_argument("--chunk-seconds", type=float, default=0.5, help="Audio per POST")
+    parser.add_argument("--interval", type=float, default=None, help=f"Seconds between scores (server default {config.STREAM_INTERVAL_SECONDS})")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = args.files or [write_wav(os.path.join(tmp, "stream.wav"), duration=30, fault=True)]
+        results, errors = [], []
+
+        def run(path):
+            try:
+                results.append(replay(args.url.rstrip("/"), path, args.speed, args.chunk_seconds, args.interval, not args.quiet))
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                errors.append(f"{path}: {e}")
+
+        threads = [threading.Thread(target=run, args=(path,)) for path in files]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    print("\n" + "="*88)
+    print(f"{'file':>24} {'audio s':>8} {'wall s':>7} {'x realtime':>10} {'windows':>8} {'max':>6} {'chunk p50 ms':>13} {'p95 ms':>7}")
+    print("="*88)
+    for r in results:
+        max_score = f"{r['max_score']:.3f}" if r["max_score"] is not None else "-"
+        print(f"{os.path.basename(r['path'])[-24:]:>24} {r['received_seconds']:>8.1f} {r['wall_seconds']:>7.1f} "
+              f"{r['received_seconds'] / r['wall_seconds']:>10.1f} {r['windows']:>8} {max_score:>6} "
+              f"{np.percentile(r['latencies'], 50):>13.1f} {np.percentile(r['latencies'], 95):>7.1f}")
+    print("="*88)
+    for error in errors:
+        print(f"❌ {error}")
+
+if __name__ == "__main__":
+    main()
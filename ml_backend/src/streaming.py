@@ -0,0 +1,291 @@
+import threading
+import time
+import uuid
+import numpy as np
+import scipy.fft
+import soundfile as sf
+import soxr
+from src import config
+from src.mel_engine import get_engine
+
+def iter_audio_blocks(source, block_seconds=10.0, sample_rate=config.SAMPLE_RATE):
+    """
+    Yields mono float32 blocks at sample_rate from a path or file-like object,
+    decoding (and resampling) block by block instead of loading the whole file.
+    """
+    with sf.SoundFile(source) as f:
+        resampler = None
+        if f.samplerate != sample_rate:
+            resampler = soxr.ResampleStream(f.samplerate, sample_rate, 1, dtype="float32", quality="HQ")
+        blocksize = max(1, int(f.samplerate * block_seconds))
+        for block in f.blocks(blocksize=blocksize, dtype="float32", always_2d=True):
+            mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            if resampler is not None:
+                mono = resampler.resample_chunk(np.ascontiguousarray(mono), last=False)
+            if len(mono):
+                yield mono
+        if resampler is not None:
+            tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+            if len(tail):
+                yield tail
+
+class IncrementalMelSpectrogram:
+    """
+    Streaming equivalent of MelEngine.power_mel: push() audio as it arrives and get
+    back only the new mel power columns. Each STFT frame is computed exactly once,
+    with the same centering (n_fft // 2 zeros at the start, and at the end on flush())
+    as the whole-clip path.
+    """
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+        self.n_fft = self.engine.n_fft
+        self.hop_length = self.engine.hop_length
+        self._buffer = np.zeros(self.n_fft // 2, dtype=np.float32) # Center padding
+        self.samples_seen = 0
+
+    def _frames(self):
+        if len(self._buffer) < self.n_fft:
+            return np.zeros((0, self.engine.n_mels), dtype=np.float32)
+        n_frames = 1 + (len(self._buffer) - self.n_fft) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(self._buffer, self.n_fft)[::self.hop_length][:n_frames]
+        spectrum = scipy.fft.rfft(frames * self.engine.window, axis=-1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        self._buffer = self._buffer[n_frames * self.hop_length:]
+        return power @ self.engine.filterbank_t
+
+    def push(self, samples):
+        """Adds samples; returns (new_frames, n_mels) mel power columns."""
+        self.samples_seen += len(samples)
+        self._buffer = np.concatenate([self._buffer, np.asarray(samples, dtype=np.float32)])
+        return self._frames()
+
+    def flush(self):
+        """Pads the end like center=True and returns the remaining columns."""
+        self._buffer = np.concatenate([self._buffer, np.zeros(self.n_fft // 2, dtype=np.float32)])
+        columns = self._frames()
+        self._buffer = np.zeros(0, dtype=np.float32)
+        return columns
+
+class MelWindowRing:
+    """
+    Fixed-size ring of the most recent mel columns. Emits a (window_frames, n_mels)
+    window every hop_frames columns once window_frames columns have arrived.
+    """
+    def __init__(self, n_mels=config.N_MELS, window_frames=config.INPUT_SHAPE[1], hop_frames=1):
+        self.window_frames = window_frames
+        self.hop_frames = max(1, hop_frames)
+        self._ring = np.zeros((window_frames, n_mels), dtype=np.float32)
+        self._write = 0
+        self.total = 0 # Columns ever appended
+        self.next_end = window_frames # Column count at which the next window is complete
+
+    def window(self):
+        """The latest window_frames columns in time order."""
+        return np.concatenate([self._ring[self._write:], self._ring[:self._write]])
+
+    def append(self, columns):
+        """Adds columns; returns a list of (start_column, window) for every window completed."""
+        windows = []
+        while len(columns):
+            # Never write past a window boundary before emitting that window
+            take = min(len(columns), self.next_end - self.total, self.window_frames - self._write)
+            self._ring[self._write:self._write + take] = columns[:take]
+            self._write = (self._write + take) % self.window_frames
+            self.total += take
+            columns = columns[take:]
+            if self.total == self.next_end:
+                windows.append((self.total - self.window_frames, self.window()))
+                self.next_end += self.hop_frames
+        return windows
+
+def hop_frames_for(hop_seconds):
+    return max(1, int(round(hop_seconds * config.SAMPLE_RATE / config.HOP_LENGTH)))
+
+def iter_windows(blocks, hop_seconds=config.WINDOW_HOP_SECONDS, engine=None):
+    """
+    Turns an iterable of audio blocks into (start_seconds, mel power window) pairs:
+    overlapping INPUT_SHAPE[1]-frame windows every hop_seconds. Audio shorter than one
+    window is zero-padded (like fix_length); a final window is aligned to the end of
+    the recording so the tail is always scored.
+    """
+    stft = IncrementalMelSpectrogram(engine)
+    ring = MelWindowRing(stft.engine.n_mels, config.INPUT_SHAPE[1], hop_frames_for(hop_seconds))
+    seconds_per_frame = config.HOP_LENGTH / config.SAMPLE_RATE
+    emitted = False
+    last_start = None
+
+    for block in blocks:
+        for start, window in ring.append(stft.push(block)):
+            emitted = True
+            last_start = start
+            yield start * seconds_per_frame, window
+
+    if not emitted:
+        # Too short for a single window: pad like the whole-clip path does
+        target_length = config.CLIP_SAMPLES
+        ring.append(stft.push(np.zeros(max(0, target_length - stft.samples_seen), dtype=np.float32)))
+    for start, window in ring.append(stft.flush()):
+        emitted = True
+        last_start = start
+        yield start * seconds_per_frame, window
+
+    tail_start = ring.total - ring.window_frames
+    if tail_start >= 0 and tail_start != last_start:
+        yield tail_start * seconds_per_frame, ring.window()
+
+def score_windows(blocks, model, hop_seconds=config.WINDOW_HOP_SECONDS, batch_size=config.BATCH_SIZE):
+    """
+    Scores a recording as overlapping windows, batching windows through model.predict.
+    Returns {"windows": [{"start": s, "end": s, "score": p}, ...], "max", "mean",
+    "fraction_faulty", "num_windows"}. Only one batch of windows is held at a time.
+    """
+    engine = get_engine()
+    window_seconds = config.INPUT_SHAPE[1] * config.HOP_LENGTH / config.SAMPLE_RATE
+    results = []
+    starts, mels = [], []
+
+    def run_batch():
+        features = engine.to_features(np.stack(mels).transpose(0, 2, 1))
+        scores = np.asarray(model.predict(features)).reshape(-1)
+        for start, score in zip(starts, scores):
+            results.append({"start": round(start, 3), "end": round(start + window_seconds, 3), "score": float(score)})
+        starts.clear()
+        mels.clear()
+
+    for start, window in iter_windows(blocks, hop_seconds, engine):
+        starts.append(start)
+        mels.append(window)
+        if len(mels) == batch_size:
+            run_batch()
+    if mels:
+        run_batch()
+
+    scores = np.array([r["score"] for r in results])
+    return {
+        "windows": results,
+        "num_windows": len(results),
+        "max": float(scores.max()),
+        "mean": float(scores.mean()),
+        "fraction_faulty": float(np.mean(scores > 0.5)),
+    }
+
+PCM_FORMATS = {"s16le": np.dtype("<i2"), "f32le": np.dtype("<f4")}
+
+class StreamSession:
+    """
+    State of one live audio stream: raw PCM bytes in, (start_seconds, mel power window)
+    pairs out every interval_seconds once a full INPUT_SHAPE[1]-frame window has arrived.
+
+    Each STFT hop is computed once as samples arrive (IncrementalMelSpectrogram) and only
+    the latest window of mel columns is kept (MelWindowRing), so memory per stream is
+    bounded no matter how long it runs. Input at another sample rate is resampled on the fly.
+    """
+    def __init__(self, stream_id, sample_rate=config.SAMPLE_RATE, channels=1, sample_format="s16le",
+                 interval_seconds=config.STREAM_INTERVAL_SECONDS, engine=None):
+        if sample_format not in PCM_FORMATS:
+            raise ValueError(f"Unknown format '{sample_format}' (expected one of {sorted(PCM_FORMATS)})")
+        if sample_rate <= 0 or channels <= 0 or interval_seconds <= 0:
+            raise ValueError("sample_rate, channels and interval must be positive")
+        self.stream_id = stream_id
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = PCM_FORMATS[sample_format]
+        self.frame_bytes = self.dtype.itemsize * channels
+        self.stft = IncrementalMelSpectrogram(engine)
+        self.ring = MelWindowRing(self.stft.engine.n_mels, config.INPUT_SHAPE[1], hop_frames_for(interval_seconds))
+        self.interval_seconds = self.ring.hop_frames * config.HOP_LENGTH / config.SAMPLE_RATE
+        self.resampler = None
+        if sample_rate != config.SAMPLE_RATE:
+            self.resampler = soxr.ResampleStream(sample_rate, config.SAMPLE_RATE, 1, dtype="float32", quality="HQ")
+        self._partial = b"" # Trailing bytes of an incomplete sample frame
+        self._last_start = None
+        self.samples_received = 0 # At SAMPLE_RATE
+        self.windows_emitted = 0
+        self.max_score = None
+        self.lock = threading.Lock()
+        self.last_active = time.monotonic()
+
+    def push(self, data):
+        """Adds raw interleaved PCM bytes; returns [(start_seconds, window), ...] for every window completed."""
+        self.last_active = time.monotonic()
+        data = self._partial + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self._partial = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype).reshape(-1, self.channels).astype(np.float32)
+        if self.dtype.kind == "i":
+            samples /= 32768.0
+        mono = samples.mean(axis=1) if self.channels > 1 else samples[:, 0]
+        if self.resampler is not None:
+            mono = self.resampler.resample_chunk(np.ascontiguousarray(mono), last=False)
+        self.samples_received += len(mono)
+        return self._emit(self.ring.append(self.stft.push(mono)))
+
+    def flush(self):
+        """
+        Ends the stream like iter_windows ends a recording: pads short streams to CLIP_SAMPLES,
+        applies the end centering and returns the remaining windows, including one aligned to
+        the end of the audio so the tail is always scored.
+        """
+        mono = np.zeros(0, dtype=np.float32)
+        if self.resampler is not None:
+            mono = self.resampler.resample_chunk(mono, last=True)
+            self.samples_received += len(mono)
+        if self.windows_emitted == 0:
+            mono = np.concatenate([mono, np.zeros(max(0, config.CLIP_SAMPLES - self.stft.samples_seen - len(mono)), dtype=np.float32)])
+        windows = self.ring.append(np.concatenate([self.stft.push(mono), self.stft.flush()]))
+        last_start = windows[-1][0] if windows else self._last_start
+        tail_start = self.ring.total - self.ring.window_frames
+        if tail_start >= 0 and tail_start != last_start:
+            windows.append((tail_start, self.ring.window()))
+        return self._emit(windows)
+
+    def _emit(self, windows):
+        if windows:
+            self._last_start = windows[-1][0]
+            self.windows_emitted += len(windows)
+        seconds_per_frame = config.HOP_LENGTH / config.SAMPLE_RATE
+        return [(start * seconds_per_frame, window) for start, window in windows]
+
+    @property
+    def seconds_received(self):
+        return self.samples_received / config.SAMPLE_RATE
+
+class StreamManager:
+    """
+    Open StreamSessions by id. Streams idle for longer than idle_timeout seconds are
+    evicted whenever a stream is opened or looked up; at most max_streams are open at once.
+    """
+    def __init__(self, max_streams=config.MAX_STREAMS, idle_timeout=config.STREAM_IDLE_TIMEOUT):
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._streams)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for stream_id in [s for s, session in self._streams.items() if session.last_active < cutoff]:
+            del self._streams[stream_id]
+            self.evicted += 1
+
+    def open(self, **kwargs):
+        """Creates a session (kwargs as for StreamSession), or returns None if max_streams are open."""
+        with self._lock:
+            self._evict_idle()
+            if len(self._streams) >= self.max_streams:
+                return None
+            session = StreamSession(uuid.uuid4().hex, **kwargs)
+            self._streams[session.stream_id] = session
+            return session
+
+    def get(self, stream_id):
+        with self._lock:
+            self._evict_idle()
+            return self._streams.get(stream_id)
+
+    def close(self, stream_id):
+        with self._lock:
+            return self._streams.pop(stream_id, None)
@@ -4,92 +4,112 @@ import argparse
 import numpy as np
 import tensorflow as tf
 from sklearn.model_selection import train_test_split, GroupShuffleSplit
-from src import config, preprocess, model as model_module
+from src import augment as augment_module, config, export, feature_store, manifest as manifest_module, model as model_module, input_pipeline, perf
+from src.feature_cache import FeatureCache
+
+class StoreSequence(tf.keras.utils.Sequence):
+    """Feeds batches gathered from a FeatureStore by index, so only one batch is in RAM at a time."""
+    def __init__(self, store, indices, batch_size=config.BATCH_SIZE, shuffle=False):
+        super().__init__()
+        self.store = store
+        self.indices = np.array(indices)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+
+    def __len__(self):
+        return int(np.ceil(len(self.indices) / self.batch_size))
+
+    def __getitem__(self, i):
+        batch = self.indices[i * self.batch_size:(i + 1) * self.batch_size]
+        return self.store.take(batch), self.store.labels[batch]
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            np.random.shuffle(self.indices)
+
+def train(dataset_path, resume=False, num_workers=None, cache_dir=config.FEATURE_CACHE_DIR,
+          store_dir=config.FEATURE_STORE_DIR, streaming=False, quantize=(),
+          intra_op_threads=config.TRAIN_INTRA_OP_THREADS, inter_op_threads=config.TRAIN_INTER_OP_THREADS,
+          jit_compile=config.TRAIN_JIT_COMPILE, steps_per_execution=config.STEPS_PER_EXECUTION,
+          precision=config.TRAIN_PRECISION, perf_report=config.TRAIN_PERF_REPORT_PATH,
+          manifest_path=config.MANIFEST_PATH, augment=False, seed=config.TRAIN_SEED, rescan=False):
+    # CPU performance settings (thread pools must be set before TensorFlow runs anything)
+    perf.configure_threads(intra_op_threads, inter_op_threads)
+    precision = perf.set_precision(precision)
+    if seed is not None:
+        tf.keras.utils.set_random_seed(seed) # Python, NumPy and TensorFlow (weight init, dropout)
 
-def train(dataset_path, resume=False):
-    all_X = []
-    all_y = []
-    
-    # Handle single string or list of paths
-    if isinstance(dataset_path, str):
-        dataset_paths = [dataset_path]
-    else:
-        dataset_paths = dataset_path
-        
-    all_groups = []
-    
     # Handle single string or list of paths
     if isinstance(dataset_path, str):
         dataset_paths = [dataset_path]
     else:
         dataset_paths = dataset_path
         
-    for path in dataset_paths:
-        print(f"Loading data from {path}...")
-        results = preprocess.preprocess_dataset(path)
-        # Check if existing preprocess handles 2 or 3 returns
-        if len(results) == 3:
-            X, y, groups = results
-        else:
-            X, y = results
-            groups = np.array(["unknown"] * len(y))
-
-        if len(X) > 0:
-            all_X.append(X)
-            all_y.append(y)
-            # Prefix groups with path hash to ensure distinctness across datasets
-            path_prefix = str(hash(path) % 10000) 
-            distinct_groups = [f"{path_prefix}_{g}" for g in groups]
-            all_groups.append(distinct_groups)
+    # Reuse features from earlier runs unless caching is disabled
+    cache = FeatureCache(cache_dir) if cache_dir else None
+    
+    # List dataset files from the incremental manifest (only changed directories are re-scanned, every file with rescan)
+    manifest = manifest_module.open_updated(dataset_paths, manifest_path, full=rescan) if manifest_path else None
+    
+    # Features live in memory-mapped shards on disk; everything below works on indices
+    failures = []
+    store = feature_store.build_feature_store(dataset_paths, store_dir, num_workers=num_workers, cache=cache, manifest=manifest,
+                                              failures=failures)
+    if failures:
+        print(f"⚠️ Skipped {len(failures)} files that could not be processed:")
+        for file_path, error in failures:
+            print(f"  {file_path}: {error}")
             
-    if not all_X:
+    if len(store) == 0:
         print("No data found in any dataset paths!")
         return
 
-    X = np.concatenate(all_X, axis=0)
-    y = np.concatenate(all_y, axis=0)
-    groups = np.concatenate(all_groups, axis=0)
+    y = store.labels
+    groups = store.groups
     
-    print(f"Total Combined Data: {len(X)} samples")
+    print(f"Total Combined Data: {len(store)} samples")
     print(f"Global Distribution: {np.unique(y, return_counts=True)}")
     print(f"Unique Machine Groups: {len(np.unique(groups))}")
 
     # Split into train and validation using GROUPS
     # This prevents 'Leakage' where same machine appears in both train and test.
     gss = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
-    train_idx, val_idx = next(gss.split(X, y, groups))
+    train_idx, val_idx = next(gss.split(np.zeros(len(y)), y, groups))
     
-    X_train, X_val = X[train_idx], X[val_idx]
-    y_train, y_val = y[train_idx], y[val_idx]
+    y_train = y[train_idx]
     groups_train, groups_val = groups[train_idx], groups[val_idx]
     
     print(f"Training on {len(np.unique(groups_train))} machines, Validation on {len(np.unique(groups_val))} machines.")
     
-    # --- OVERSAMPLING (Better than Class Weights) ---
-    # Separate classes
-    bool_train_labels = y_train != 0
-    pos_features = X_train[bool_train_labels]
-    neg_features = X_train[~bool_train_labels]
-    pos_labels = y_train[bool_train_labels]
-    neg_labels = y_train[~bool_train_labels]
+    if augment and not streaming:
+        print("Augmentation runs in the tf.data pipeline, switching to --streaming.")
+        streaming = True
 
-    ids = np.arange(len(pos_features))
-    choices = np.random.choice(ids, len(neg_features)) # Sample positive class to match negative size
-    
-    res_pos_features = pos_features[choices]
-    res_pos_labels = pos_labels[choices]
-    
-    res_X_train = np.concatenate([res_pos_features, neg_features], axis=0)
-    res_y_train = np.concatenate([res_pos_labels, neg_labels], axis=0)
-    
-    # Shuffle
-    order = np.arange(len(res_y_train))
-    np.random.shuffle(order)
-    X_train = res_X_train[order]
-    y_train = res_y_train[order]
-    
-    print(f"Oversampled Training Data: {len(X_train)} samples")
-    # ------------------------------------------------
+    if streaming:
+        # tf.data balances the classes by sampling indices on the fly (and augments each batch with --augment)
+        augmenter = augment_module.Augmenter(store, train_idx) if augment else None
+        train_data = input_pipeline.make_dataset(store, train_idx, training=True, seed=seed, augmenter=augmenter)
+        train_samples = input_pipeline.epoch_size(store, train_idx)
+        val_data = input_pipeline.make_dataset(store, val_idx)
+        print(f"Streaming Training Data: {len(train_idx)} samples (balanced by index sampling{', augmented on the fly' if augment else ''})")
+    else:
+        # --- OVERSAMPLING (Better than Class Weights) ---
+        # Separate classes (as store indices, no feature copies)
+        pos_idx = train_idx[y_train != 0]
+        neg_idx = train_idx[y_train == 0]
+
+        choices = np.random.choice(pos_idx, len(neg_idx)) # Sample positive class to match negative size
+        
+        # Shuffle
+        train_order = np.concatenate([choices, neg_idx])
+        np.random.shuffle(train_order)
+        
+        print(f"Oversampled Training Data: {len(train_order)} samples")
+        # ------------------------------------------------
+        
+        train_data = StoreSequence(store, train_order, shuffle=True)
+        train_samples = len(train_order)
+        val_data = StoreSequence(store, val_idx)
     
     # 2. Setup Model
     if resume:
@@ -101,10 +121,13 @@ def train(dataset_path, resume=False):
             model = tf.keras.models.load_model(config.MODEL_SAVE_PATH)
         else:
             print("No saved model found to resume. Creating new model...")
-            model = model_module.create_model()
+            model = model_module.create_model(jit_compile=jit_compile, steps_per_execution=steps_per_execution)
+        if jit_compile or steps_per_execution > 1:
+            # Loaded models keep their saved compile settings; apply the requested ones (optimizer state is kept)
+            model_module.compile_model(model, model.optimizer, jit_compile, steps_per_execution)
     else:
         print("Creating new model...")
-        model = model_module.create_model()
+        model = model_module.create_model(jit_compile=jit_compile, steps_per_execution=steps_per_execution)
         
     model.summary()
     
@@ -134,6 +157,7 @@ def train(dataset_path, resume=False):
                 f.write(str(epoch + 1))
                 
     state_cb = TrainingStateCallback()
+    epoch_timer = perf.EpochTimer(samples_per_epoch=train_samples)
 
     initial_epoch = 0
     if resume and os.path.exists("training_state.txt"):
@@ -145,26 +169,39 @@ def train(dataset_path, resume=False):
             print("Could not read training state. Starting from Epoch 0.")
 
     history = model.fit(
-        X_train, y_train,
+        train_data,
         initial_epoch=initial_epoch,
         epochs=config.EPOCHS, # Will run until Epoch 50
-        batch_size=config.BATCH_SIZE,
-        validation_data=(X_val, y_val),
-        callbacks=[checkpoint_best, checkpoint_latest, state_cb]
+        validation_data=val_data,
+        callbacks=[epoch_timer, checkpoint_best, checkpoint_latest, state_cb]
     )
     
+    perf.write_report(epoch_timer, {
+        "samples": len(store),
+        "streaming": streaming,
+        "batch_size": config.BATCH_SIZE,
+        "intra_op_threads": intra_op_threads,
+        "inter_op_threads": inter_op_threads,
+        "jit_compile": jit_compile,
+        "steps_per_execution": steps_per_execution,
+        "precision": precision,
+    }, perf_report)
+    
+    if precision != "float32":
+        # Export a plain float32 copy so the final .h5 and the TFLite files carry no mixed precision casts
+        tf.keras.mixed_precision.set_global_policy("float32")
+        float_model = model_module.create_model()
+        float_model.set_weights(model.get_weights())
+        model = float_model
+    
     # 4. Save Final Model (Overwrites Best? No, keep Best)
     # But usually final model is good to have.
     print(f"Saving final model to final_{config.MODEL_SAVE_PATH}...")
     model.save(f"final_{config.MODEL_SAVE_PATH}")
     
-    # 5. Convert to TFLite
-    print(f"Converting to TFLite at {config.TFLITE_MODEL_PATH}...")
-    converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    tflite_model = converter.convert()
-    
-    with open(config.TFLITE_MODEL_PATH, 'wb') as f:
-        f.write(tflite_model)
+    # 5. Convert to TFLite (float32 plus any requested quantized variants)
+    variants = ["float32"] + [v for v in quantize if v != "float32"]
+    export.export_tflite_variants(model, store, train_idx, val_idx, variants)
         
     print("Training and export complete!")
 
@@ -172,7 +209,31 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Train Audio Fault Detection Model")
     parser.add_argument("--dataset", nargs='+', default=config.DATASET_PATHS, help="Path(s) to dataset directory. Can verify multiple.")
     parser.add_argument("--resume", action="store_true", help="Resume training from existing model")
+    parser.add_argument("--workers", type=int, default=config.NUM_WORKERS, help="Processes used for feature extraction (1 = serial)")
+    parser.add_argument("--cache-dir", type=str, default=config.FEATURE_CACHE_DIR, help="Directory for cached features")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-extract features from audio")
+    parser.add_argument("--store-dir", type=str, default=config.FEATURE_STORE_DIR, help="Directory for the memory-mapped feature store")
+    parser.add_argument("--manifest", type=str, default=config.MANIFEST_PATH, help="Dataset manifest (SQLite) used to list files")
+    parser.add_argument("--no-manifest", action="store_true", help="Walk the dataset directories instead of using the manifest")
+    parser.add_argument("--rescan", action="store_true", help="Re-stat every file in the manifest (needed after wavs are rewritten in place)")
+    parser.add_argument("--streaming", action="store_true", help="Feed training through a tf.data pipeline with index-based balancing")
+    parser.add_argument("--augment", action="store_true", help="Augment training batches on the fly (roll, background mixing, SpecAugment); implies --streaming")
+    parser.add_argument("--seed", type=int, default=config.TRAIN_SEED, help="Seed for a reproducible run (init, sampling, augmentation)")
+    parser.add_argument("--quantize", nargs='+', default=[], choices=export.VARIANTS, help="Extra TFLite variants to export and compare")
+    parser.add_argument("--intra-threads", type=int, default=config.TRAIN_INTRA_OP_THREADS, help="TensorFlow intra-op threads (0 = default)")
+    parser.add_argument("--inter-threads", type=int, default=config.TRAIN_INTER_OP_THREADS, help="TensorFlow inter-op threads (0 = default)")
+    parser.add_argument("--jit-compile", action="store_true", default=config.TRAIN_JIT_COMPILE, help="Compile the train step with XLA")
+    parser.add_argument("--steps-per-execution", type=int, default=config.STEPS_PER_EXECUTION, help="Train steps per compiled call")
+    parser.add_argument("--precision", type=str, default=config.TRAIN_PRECISION, choices=perf.PRECISIONS, help="Keras mixed precision policy")
+    parser.add_argument("--perf-report", type=str, default=config.TRAIN_PERF_REPORT_PATH, help="JSON file that epoch timings are appended to")
     
     args = parser.parse_args()
     
-    train(args.dataset, args.resume)
+    train(args.dataset, args.resume, num_workers=args.workers,
+          cache_dir=None if args.no_cache else args.cache_dir, store_dir=args.store_dir,
+          streaming=args.streaming, quantize=args.quantize,
+          intra_op_threads=args.intra_threads, inter_op_threads=args.inter_threads,
+          jit_compile=args.jit_compile, steps_per_execution=args.steps_per_execution,
+          precision=args.precision, perf_report=args.perf_report,
+          manifest_path=None if args.no_manifest else args.manifest,
+          augment=args.augment, seed=args.seed, rescan=args.rescan)